@@ -0,0 +1,72 @@
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from organizer import SyncFileOrganizer  # noqa: E402
+
+
+def make_config(categories: int, blacklist: int) -> Dict[str, object]:
+    file_categories = {f"Category{c:03d}": [f"e{c:03d}{i}" for i in range(4)] for c in range(categories)}
+    return {
+        "blacklisted_files": [f"skip{i:05d}.dat" for i in range(blacklist // 2)],
+        "blacklisted_directories": [],
+        "blacklisted_filetypes": [f"b{i:05d}" for i in range(blacklist - blacklist // 2)],
+        "file_categories": file_categories,
+    }
+
+
+def make_names(config: Dict[str, object], count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    extensions = [ext for exts in config["file_categories"].values() for ext in exts] + ["unknown"]
+    return [f"file{i}.{rng.choice(extensions)}" for i in range(count)]
+
+
+def legacy_classify(config: Dict[str, object], filename: str):
+    # The list-scanning lookup organize_files used before the RuleIndex.
+    file_extension = SyncFileOrganizer.get_file_extension(filename)
+    if filename in config['blacklisted_files'] or file_extension in config['blacklisted_filetypes']:
+        return None
+    file_categories = config["file_categories"]
+    category_folder = next((cat for cat, exts in file_categories.items() if file_extension in exts), 'Others')
+    if category_folder in file_categories and file_extension in file_categories[category_folder]:
+        return category_folder, file_extension.upper()
+    return category_folder, None
+
+
+def indexed_classify(organizer: SyncFileOrganizer, filename: str):
+    if organizer.is_blacklisted(filename, filename):
+        return None
+    return organizer.get_destination_folder(organizer.get_file_extension(filename))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Classification throughput with and without the RuleIndex.")
+    parser.add_argument("--files", type=int, default=200_000)
+    parser.add_argument("--categories", type=int, default=500)
+    parser.add_argument("--blacklist", type=int, default=5_000)
+    args = parser.parse_args()
+
+    config = make_config(args.categories, args.blacklist)
+    names = make_names(config, args.files)
+    organizer = SyncFileOrganizer(config)
+
+    start = time.perf_counter()
+    organizer.rebuild_rules()
+    print(f"{'index build':<16} {(time.perf_counter() - start) * 1000:10.2f} ms")
+
+    for label, classify in [("legacy", lambda name: legacy_classify(config, name)),
+                            ("indexed", lambda name: indexed_classify(organizer, name))]:
+        start = time.perf_counter()
+        for name in names:
+            classify(name)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<16} {args.files:>10,} files  {elapsed:8.3f} s  {args.files / elapsed:>14,.0f} files/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import argparse
+import asyncio
+import copy
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from organizer import ParallelFileOrganizer, SyncFileOrganizer  # noqa: E402
+from synthetic import BENCH_CONFIG, make_tree  # noqa: E402
+
+
+def run(organizer, file_count: int) -> float:
+    with tempfile.TemporaryDirectory() as root:
+        make_tree(root, file_count)
+        start = time.perf_counter()
+        moved = asyncio.run(organizer.organize_files(root))
+        elapsed = time.perf_counter() - start
+        assert len(moved) == file_count, (len(moved), file_count)
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare SyncFileOrganizer with ParallelFileOrganizer.")
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--processes", action="store_true", help="use a process pool instead of threads")
+    args = parser.parse_args()
+
+    organizers = [
+        ("SyncFileOrganizer", SyncFileOrganizer(copy.deepcopy(BENCH_CONFIG))),
+        ("ParallelFileOrganizer", ParallelFileOrganizer(copy.deepcopy(BENCH_CONFIG), max_workers=args.workers,
+                                                        use_processes=args.processes)),
+    ]
+    for name, organizer in organizers:
+        elapsed = run(organizer, args.files)
+        print(f"{name:<24} {args.files:>9,} files  {elapsed:8.2f} s  {args.files / elapsed:>12,.0f} files/s")
+
+
+if __name__ == "__main__":
+    main()
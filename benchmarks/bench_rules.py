@@ -0,0 +1,105 @@
+import argparse
+import fnmatch
+import os
+import random
+import re
+import sys
+import time
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rules import RuleEngine, parse_size  # noqa: E402
+from scanner import FileRecord  # noqa: E402
+
+DAY = 86400
+
+
+def make_rules(count: int, seed: int = 0) -> List[Dict[str, object]]:
+    rng = random.Random(seed)
+    rules: List[Dict[str, object]] = []
+    for index in range(count):
+        kind = index % 4
+        if kind == 0:
+            rules.append({"folder": f"Ext{index}", "extensions": [f"x{index}", f"y{index}"]})
+        elif kind == 1:
+            rules.append({"folder": f"Glob{index}", "glob": f"report{index}_*"})
+        elif kind == 2:
+            rules.append({"folder": f"Regex{index}", "regex": rf"^scan{index}-\d+"})
+        else:
+            rules.append({"folder": f"Large{index}", "extensions": [f"v{index}"],
+                          "larger_than": f"{rng.randint(1, 100)}MB"})
+    rules.append({"folder": "Large", "larger_than": "1GB"})
+    rules.append({"folder": "Archive/{year}/{month}", "older_than_days": 90})
+    return rules
+
+
+def make_records(rules: List[Dict[str, object]], count: int, seed: int = 0) -> List[FileRecord]:
+    rng = random.Random(seed)
+    now = time.time()
+    names = [f"file{{}}.{ext}" for ext in ("txt", "jpg", "pdf", "mp4", "log")]
+    for index, rule in enumerate(rules[:-2]):
+        kind = index % 4
+        if kind in (0, 3):
+            names.append(f"file{{}}.{rule['extensions'][0]}")
+        elif kind == 1:
+            names.append(f"report{index}_{{}}.pdf")
+        else:
+            names.append(f"scan{index}-{{}}.png")
+    records = []
+    for index in range(count):
+        name = rng.choice(names).format(index)
+        records.append(FileRecord(name, name, os.path.splitext(name)[1][1:], rng.randint(0, 2 * 1024 ** 3),
+                                  now - rng.random() * 365 * DAY))
+    return records
+
+
+def naive_match(rules: List[Dict[str, object]], record: FileRecord, now: float) -> Optional[str]:
+    # Every rule against every file, as a straightforward implementation would.
+    for rule in rules:
+        if "extensions" in rule and record.ext not in rule["extensions"]:
+            continue
+        if "glob" in rule and not fnmatch.fnmatch(record.name.lower(), rule["glob"].lower()):
+            continue
+        if "regex" in rule and not re.search(rule["regex"], record.name):
+            continue
+        if "larger_than" in rule and record.size <= parse_size(rule["larger_than"]):
+            continue
+        if "older_than_days" in rule and record.mtime >= now - rule["older_than_days"] * DAY:
+            continue
+        return rule["folder"]
+    return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rule evaluation throughput, compiled engine against a naive loop.")
+    parser.add_argument("--files", type=int, default=1_000_000)
+    parser.add_argument("--rules", type=int, default=200)
+    parser.add_argument("--naive-files", type=int, default=20_000,
+                        help="files for the (slow) naive loop")
+    args = parser.parse_args()
+
+    rules = make_rules(args.rules)
+    records = make_records(rules, args.files)
+
+    start = time.perf_counter()
+    engine = RuleEngine(rules)
+    print(f"{'compile':<10} {len(rules):>9,} rules  {(time.perf_counter() - start) * 1000:8.2f} ms")
+
+    start = time.perf_counter()
+    for record in records:
+        engine.match(record.name, record.ext, record.size, record.mtime)
+    elapsed = time.perf_counter() - start
+    print(f"{'compiled':<10} {args.files:>9,} files  {elapsed:8.3f} s  {args.files / elapsed * 60:>14,.0f} files/min")
+
+    now = time.time()
+    sample = records[:args.naive_files]
+    start = time.perf_counter()
+    for record in sample:
+        naive_match(rules, record, now)
+    elapsed = time.perf_counter() - start
+    print(f"{'naive':<10} {len(sample):>9,} files  {elapsed:8.3f} s  {len(sample) / elapsed * 60:>14,.0f} files/min")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search import SearchQuery, iter_search  # noqa: E402
+
+WORDS = ["report", "invoice", "photo", "scan", "notes", "backup", "draft", "final", "summary", "budget"]
+EXTENSIONS = ["txt", "pdf", "jpg", "png", "docx", "mp3", "mp4", "zip", "py", "log"]
+
+
+def make_tree(root: str, file_count: int, files_per_directory: int = 200, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    directory = root
+    for index in range(file_count):
+        if index % files_per_directory == 0:
+            directory = os.path.join(root, f"d{index // files_per_directory // 100:04d}",
+                                     f"d{index // files_per_directory:06d}")
+            os.makedirs(directory)
+        name = f"{rng.choice(WORDS)}_{rng.choice(WORDS)}_{index}.{rng.choice(EXTENSIONS)}"
+        open(os.path.join(directory, name), 'wb').close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Search latency: time to the first result and to the last.")
+    parser.add_argument("--files", type=int, default=200_000)
+    args = parser.parse_args()
+
+    queries = [
+        SearchQuery("invoice", 'substring'),
+        SearchQuery("budget_*.pdf", 'glob'),
+        SearchQuery(r"^scan_\w+_\d+7\.jpg$", 'regex'),
+        SearchQuery("invfin", 'fuzzy'),
+        SearchQuery("report", 'substring', extensions=["pdf"], newer_than_days=1),
+    ]
+    with tempfile.TemporaryDirectory() as root:
+        make_tree(root, args.files)
+        for query in queries:
+            start = time.perf_counter()
+            first = None
+            count = 0
+            for _ in iter_search(root, query):
+                if first is None:
+                    first = time.perf_counter() - start
+                count += 1
+            elapsed = time.perf_counter() - start
+            first_ms = f"{first * 1000:8.2f} ms" if first is not None else "       - ms"
+            print(f"{query.mode:<10} {query.query!r:<26} first {first_ms}  all {elapsed:7.3f} s  "
+                  f"{count:>9,} results  {args.files / elapsed:>12,.0f} files/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sniff import ContentSniffer, SniffCache  # noqa: E402
+
+# Headers of a mixed download folder; the rest of each file is random bytes.
+HEADERS = [
+    b"%PDF-1.7\n",
+    b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR",
+    b"\xff\xd8\xff\xe0\x00\x10JFIF\x00",
+    b"\x00\x00\x00\x18ftypmp42",
+    b"PK\x03\x04\x14\x00\x00\x00\x08\x00",
+    b"\x7fELF\x02\x01\x01\x00",
+    b"ID3\x04\x00\x00\x00\x00\x00\x00",
+    b"",
+]
+
+
+def make_corpus(root: str, file_count: int, max_size: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    paths = []
+    for index in range(file_count):
+        path = os.path.join(root, f"download{index:07d}")
+        with open(path, 'wb') as f:
+            f.write(rng.choice(HEADERS) + os.urandom(rng.randint(0, max_size)))
+        paths.append(path)
+    return paths
+
+
+def timed(sniffer: ContentSniffer, paths: List[str]) -> float:
+    start = time.perf_counter()
+    sniffer.sniff_many(paths)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Content sniffing throughput on a mixed corpus.")
+    parser.add_argument("--files", type=int, default=20_000)
+    parser.add_argument("--max-size", type=int, default=64 * 1024, help="largest file body in bytes")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        paths = make_corpus(root, args.files, args.max_size)
+        cache = SniffCache(os.path.join(root, "cache", "sniff_cache.sqlite3"))
+        runs = [
+            ("1 thread, no cache", ContentSniffer(max_workers=1)),
+            ("pool, no cache", ContentSniffer(max_workers=args.workers)),
+            ("pool, cold cache", ContentSniffer(cache, max_workers=args.workers)),
+            ("pool, warm cache", ContentSniffer(cache, max_workers=args.workers)),
+        ]
+        for label, sniffer in runs:
+            elapsed = timed(sniffer, paths)
+            print(f"{label:<20} {args.files:>9,} files  {elapsed:8.3f} s  {args.files / elapsed:>12,.0f} files/s")
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
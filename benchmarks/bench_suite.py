@@ -0,0 +1,194 @@
+import argparse
+import asyncio
+import copy
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from journal import MoveJournal  # noqa: E402
+from metrics import Metrics  # noqa: E402
+from organizer import (  # noqa: E402
+    SyncFileOrganizer, delete_empty_folders, get_directory_stats, restore_files, search_files
+)
+from scanner import list_directory  # noqa: E402
+from synthetic import BENCH_CONFIG, DEFAULT_EXTENSIONS, make_tree  # noqa: E402
+
+# Everything timed here is the Qt-free core; the GUI only adds a QFileSystemModel
+# on top of the same directory listings, which "listing" stands in for.
+OPERATIONS = ('stats', 'search', 'listing', 'organize', 'restore', 'cleanup')
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+
+def parse_extension_mix(value: str) -> Dict[str, float]:
+    # "txt:5,pdf:2,jpg" -> {"txt": 5.0, "pdf": 2.0, "jpg": 1.0}
+    mix = {}
+    for item in value.split(","):
+        extension, _, weight = item.strip().partition(":")
+        mix[extension.lstrip(".")] = float(weight or 1)
+    return mix
+
+
+def list_tree(root: str) -> int:
+    # What a tree view does when every folder is expanded: one listing with
+    # file sizes per directory, level by level.
+    entries = 0
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        for entry in list_directory(directory):
+            entries += 1
+            if entry.is_dir:
+                pending.append(entry.path)
+    return entries
+
+
+def blacklisted_folders(root: str, paths: List[str], density: float, seed: int) -> List[str]:
+    folders = sorted({os.path.dirname(path) for path in paths})
+    count = round(len(folders) * density)
+    return sorted(random.Random(seed).sample(folders, count)) if count else []
+
+
+def timed(function: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def run_size(file_count: int, args: argparse.Namespace, mix: Dict[str, float]) -> Dict[str, object]:
+    results: Dict[str, object] = {}
+    best: Dict[str, float] = {}
+
+    def record(operation: str, seconds: float) -> None:
+        best[operation] = min(seconds, best.get(operation, seconds))
+
+    with tempfile.TemporaryDirectory() as workspace:
+        root = os.path.join(workspace, "tree")
+        config_dir = os.path.join(workspace, "config")
+        start = time.perf_counter()
+        paths = make_tree(root, file_count, args.files_per_dir, list(mix), args.seed, args.depth, args.fanout,
+                          list(mix.values()))
+        generate_seconds = time.perf_counter() - start
+        config = copy.deepcopy(BENCH_CONFIG)
+        config["blacklisted_directories"] = blacklisted_folders(root, paths, args.blacklist_density, args.seed)
+        del paths
+
+        phases: Dict[str, object] = {}
+        for _ in range(args.repeat):
+            record('stats', timed(lambda: get_directory_stats(root)))
+            record('search', timed(lambda: search_files(root, args.query)))
+            record('listing', timed(lambda: list_tree(root)))
+
+            organizer = SyncFileOrganizer(copy.deepcopy(config))
+            organizer.metrics = Metrics() if args.phases else None
+            with MoveJournal.for_directory(config_dir, root) as journal:
+                record('organize', timed(lambda: asyncio.run(organizer.organize_files(root, journal=journal))))
+            restore_metrics = Metrics() if args.phases else None
+            journal = MoveJournal.for_directory(config_dir, root)
+            record('restore', timed(lambda: asyncio.run(restore_files(journal, root, metrics=restore_metrics))))
+            journal.close()
+            record('cleanup', timed(lambda: delete_empty_folders(root)))
+            if args.phases:
+                phases = {"organize": organizer.metrics.to_dict()["phases"],
+                          "restore": restore_metrics.to_dict()["phases"]}
+
+    for operation in OPERATIONS:
+        seconds = best[operation]
+        results[operation] = {"seconds": seconds, "files_per_second": file_count / seconds if seconds else None}
+    results["generate_seconds"] = generate_seconds
+    if phases:
+        results["phases"] = phases
+    return results
+
+
+def compare(current: Dict[str, object], baseline: Dict[str, object], tolerance: float) -> int:
+    # Prints the change of every operation both runs measured; returns the
+    # number that got slower by more than `tolerance`.
+    regressions = 0
+    print(f"\n{'files':>10} {'operation':<10} {'baseline s':>11} {'current s':>11} {'change':>9}")
+    for size, operations in current["results"].items():
+        old_operations = baseline.get("results", {}).get(size)
+        if old_operations is None:
+            continue
+        for operation in OPERATIONS:
+            old = old_operations.get(operation, {}).get("seconds")
+            new = operations[operation]["seconds"]
+            if not old:
+                continue
+            change = new / old - 1
+            regressed = change > tolerance
+            regressions += regressed
+            print(f"{int(size):>10,} {operation:<10} {old:>11.4f} {new:>11.4f} {change:>+8.1%}"
+                  f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Time organize, restore, cleanup, stats, search and listing on synthetic trees.")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="comma-separated file counts (default: %(default)s; up to 1000000 is practical)")
+    parser.add_argument("--depth", type=int, default=2, help="folder levels above the files")
+    parser.add_argument("--fanout", type=int, default=10, help="subfolders per folder")
+    parser.add_argument("--files-per-dir", type=int, default=200)
+    parser.add_argument("--extensions", type=parse_extension_mix, default=dict.fromkeys(DEFAULT_EXTENSIONS, 1.0),
+                        help="extension mix as ext:weight pairs, e.g. 'txt:5,pdf:2,jpg:3,:1'")
+    parser.add_argument("--blacklist-density", type=float, default=0.05,
+                        help="fraction of file folders that are blacklisted (default: %(default)s)")
+    parser.add_argument("--query", default="f00001", help="search_files query")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="runs per size; the fastest is kept")
+    parser.add_argument("--phases", action="store_true", help="include per-phase metrics of organize and restore")
+    parser.add_argument("--output", metavar="FILE", help="write the results as JSON to FILE")
+    parser.add_argument("--baseline", metavar="FILE", help="compare against the JSON of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="slowdown against the baseline reported as a regression (default: %(default)s)")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    report: Dict[str, object] = {
+        "environment": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "parameters": {
+            "depth": args.depth, "fanout": args.fanout, "files_per_dir": args.files_per_dir,
+            "extensions": args.extensions, "blacklist_density": args.blacklist_density,
+            "query": args.query, "seed": args.seed, "repeat": args.repeat,
+        },
+        "results": {},
+    }
+    print(f"{'files':>10} " + " ".join(f"{operation:>10}" for operation in OPERATIONS) + "   (seconds)")
+    for size in sizes:
+        results = run_size(size, args, args.extensions)
+        report["results"][str(size)] = results
+        print(f"{size:>10,} " + " ".join(f"{results[operation]['seconds']:>10.4f}" for operation in OPERATIONS))
+
+    # The suite must stay runnable without a display or PyQt installed.
+    assert not any(module.startswith("PyQt") for module in sys.modules), "the benchmark imported Qt"
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("parameters") != report["parameters"]:
+            print("warning: the baseline was run with different parameters", file=sys.stderr)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"{regressions} operations regressed by more than {args.tolerance:.0%}.", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+import os
+import random
+from typing import List, Optional, Sequence
+
+DEFAULT_EXTENSIONS = ['txt', 'pdf', 'jpg', 'png', 'mp3', 'mp4', 'py', 'js', 'html', 'zip', 'log', '']
+
+BENCH_CONFIG = {
+    "blacklisted_files": [],
+    "blacklisted_directories": [],
+    "blacklisted_filetypes": [],
+    "file_categories": {
+        'Documents': ['txt', 'doc', 'docx', 'pdf', 'rtf', 'odt'],
+        'Images': ['jpg', 'jpeg', 'png', 'gif', 'bmp'],
+        'Audio': ['mp3', 'wav', 'ogg', 'flac'],
+        'Videos': ['mp4', 'avi', 'mkv', 'mov'],
+        'Python': ['py'],
+        'JavaScript': ['js'],
+        'HTML': ['html', 'htm']
+    }
+}
+
+
+def folder_path(root: str, folder_index: int, depth: int = 1, fanout: int = 10) -> str:
+    # Leaf folder `folder_index` below `depth` levels, `fanout` leaves per parent:
+    # depth 1 gives root/d00012, depth 3 gives root/d00000/d00001/d00012.
+    parts = [f"d{folder_index // fanout ** level:05d}" for level in range(depth - 1, -1, -1)]
+    return os.path.join(root, *parts)
+
+
+def make_tree(root: str, file_count: int, files_per_dir: int = 500,
+              extensions: Sequence[str] = DEFAULT_EXTENSIONS, seed: int = 0, depth: int = 1, fanout: int = 10,
+              weights: Optional[Sequence[float]] = None) -> List[str]:
+    # Deterministic for the same arguments: the same seed gives the same names
+    # and extensions. `weights` sets the extension mix, uniform by default.
+    rng = random.Random(seed)
+    paths = []
+    folder = root
+    for index in range(file_count):
+        if index % files_per_dir == 0:
+            folder = folder_path(root, index // files_per_dir, depth, fanout)
+            os.makedirs(folder, exist_ok=True)
+        extension = rng.choice(extensions) if weights is None else rng.choices(extensions, weights)[0]
+        name = f"f{index:07d}.{extension}" if extension else f"f{index:07d}"
+        path = os.path.join(folder, name)
+        with open(path, 'wb'):
+            pass
+        paths.append(path)
+    return paths
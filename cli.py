@@ -0,0 +1,306 @@
+import argparse
+import os
+import sys
+from contextlib import contextmanager
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+
+from journal import MoveJournal
+from metrics import Metrics
+from organizer import (
+    DUPLICATE_POLICIES, BlacklistHandler, ConfigManager, OrganizationPlan, ParallelFileOrganizer, Progress,
+    SyncFileOrganizer, execute_plan, get_directory_stats, restore_files
+)
+from search import SEARCH_MODES, SearchQuery, rank
+
+
+def _open_index(config_manager: ConfigManager, use_index: bool):
+    if not use_index:
+        return None
+    from file_index import FileIndex
+    return FileIndex(os.path.join(config_manager.CONFIG_DIR, "file_index.sqlite3"))
+
+
+def _organizer_config(args: argparse.Namespace, config_manager: ConfigManager) -> Dict[str, List[str]]:
+    config = dict(config_manager.config)
+    if args.dedupe is not None:
+        config["duplicate_policy"] = args.dedupe
+    if args.sniff:
+        config["content_sniffing"] = True
+    if args.verify:
+        config["verify_copies"] = True
+    return config
+
+
+def _duplicate_finder(config_manager: ConfigManager, config: Dict[str, List[str]]):
+    if config.get("duplicate_policy") not in DUPLICATE_POLICIES:
+        return None
+    from dedupe import DuplicateFinder, HashCache
+    return DuplicateFinder(HashCache(os.path.join(config_manager.CONFIG_DIR, "hash_cache.sqlite3")))
+
+
+def _content_sniffer(config_manager: ConfigManager, config: Dict[str, List[str]]):
+    if not config.get("content_sniffing"):
+        return None
+    from sniff import ContentSniffer, SniffCache
+    return ContentSniffer(SniffCache(os.path.join(config_manager.CONFIG_DIR, "sniff_cache.sqlite3")))
+
+
+@contextmanager
+def _profiling(args: argparse.Namespace, directory: str) -> Iterator[Optional[Metrics]]:
+    # --profile collects phase metrics, printed to stderr and written as JSON
+    # afterwards; --cprofile runs the command under cProfile (main thread only).
+    metrics = None
+    if args.profile:
+        metrics = Metrics()
+        metrics.info.update(command=args.command, directory=directory)
+    profiler = None
+    if args.cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield metrics
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.cprofile)
+        if metrics is not None:
+            metrics.stop()
+            print(metrics.summary(), file=sys.stderr)
+            metrics.save(args.profile)
+
+
+def _add_profile_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--profile", metavar="FILE",
+                        help="print time spent per phase and write the metrics as JSON to FILE")
+    parser.add_argument("--cprofile", metavar="FILE", help="run under cProfile and dump the stats to FILE")
+
+
+def cmd_gui(args: argparse.Namespace, config_manager: ConfigManager) -> int:
+    import main as gui
+    gui.main(config_manager.CONFIG_DIR)
+    return 0
+
+
+def cmd_organize(args: argparse.Namespace, config_manager: ConfigManager) -> int:
+    directory = os.path.abspath(args.directory)
+    config = _organizer_config(args, config_manager)
+    if args.parallel:
+        organizer = ParallelFileOrganizer(config, max_workers=args.workers, use_processes=args.processes,
+                                          state_dir=config_manager.CONFIG_DIR)
+    else:
+        organizer = SyncFileOrganizer(config, state_dir=config_manager.CONFIG_DIR)
+    organizer.duplicate_finder = _duplicate_finder(config_manager, config)
+    organizer.content_sniffer = _content_sniffer(config_manager, config)
+    progress = Progress()
+
+    plan: Optional[OrganizationPlan] = None
+    if args.apply_plan:
+        plan = OrganizationPlan.load(args.apply_plan)
+        if os.path.abspath(plan.directory) != directory:
+            print(f"{args.apply_plan} is a plan for {plan.directory}, not {directory}.", file=sys.stderr)
+            return 1
+
+    with _profiling(args, directory) as metrics:
+        organizer.metrics = metrics
+        if plan is None and (args.dry_run or args.plan):
+            plan = organizer.plan_organization(directory, args.type)
+            if args.plan:
+                plan.save(args.plan)
+        if plan is not None:
+            if args.dry_run:
+                for file_path, new_path in plan.iter_moves():
+                    print(f"{file_path} -> {new_path}")
+                print(f"{len(plan)} files would be moved into {len(plan.moves)} folders.")
+                return 0
+            with MoveJournal.for_directory(config_manager.CONFIG_DIR, directory) as journal:
+                moved = execute_plan(plan, progress, journal, organizer.verify_copies, metrics)
+        else:
+            import asyncio
+            with MoveJournal.for_directory(config_manager.CONFIG_DIR, directory) as journal:
+                moved = asyncio.run(organizer.organize_files(directory, args.type, progress, journal))
+
+    if args.verbose:
+        for file_path, new_path in moved:
+            print(f"{file_path} -> {new_path}")
+    print(f"Moved {len(moved)} files.")
+    if args.apply_plan and len(moved) < len(plan):
+        # Files deleted or renamed since the plan was saved are skipped.
+        print(f"Skipped {len(plan) - len(moved)} files that are no longer where the plan found them.")
+    if progress.bytes:
+        print(f"Copied {progress.bytes:,} bytes to other filesystems at "
+              f"{progress.bytes_per_second / (1024 * 1024):,.1f} MiB/s.")
+    return 0
+
+
+def cmd_restore(args: argparse.Namespace, config_manager: ConfigManager) -> int:
+    directory = os.path.abspath(args.directory)
+    journal = MoveJournal.for_directory(config_manager.CONFIG_DIR, directory)
+    if not journal:
+        print(f"No files to restore in {directory}. Use 'organize' first.", file=sys.stderr)
+        return 1
+    import asyncio
+    with _profiling(args, directory) as metrics:
+        restored = asyncio.run(restore_files(journal, directory, metrics=metrics))
+    print(f"Restored {restored} files to their original locations.")
+    return 0
+
+
+def cmd_stats(args: argparse.Namespace, config_manager: ConfigManager) -> int:
+    files, dirs, size = get_directory_stats(args.directory, _open_index(config_manager, args.index))
+    print(f"Files: {files}, Directories: {dirs}, Total size: {size:,} bytes")
+    return 0
+
+
+def cmd_search(args: argparse.Namespace, config_manager: ConfigManager) -> int:
+    index = _open_index(config_manager, args.index)
+    if index is not None and args.prefix:
+        index.refresh(args.directory)
+        paths = index.search(args.directory, args.query, prefix=True)
+        for path in paths:
+            print(path)
+        return 0 if paths else 1
+
+    extensions = [ext for value in args.ext or () for ext in value.split(",") if ext.strip()]
+    try:
+        query = SearchQuery(args.query, args.mode, extensions, args.larger_than, args.smaller_than,
+                            args.newer_than, args.older_than)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    results = SyncFileOrganizer(config_manager.config, state_dir=config_manager.CONFIG_DIR).search(args.directory, query, index)
+    # Other modes print matches as they are found; fuzzy ones need all of them to rank.
+    if args.mode == 'fuzzy':
+        results = rank(results, args.limit)
+    elif args.limit:
+        results = islice(results, args.limit)
+    found = 0
+    for result in results:
+        print(result.path)
+        found += 1
+    return 0 if found else 1
+
+
+def cmd_blacklist(args: argparse.Namespace, config_manager: ConfigManager) -> int:
+    handler = BlacklistHandler(config_manager.config, config_manager)
+    if args.action == 'show':
+        print(handler.describe_blacklist().rstrip())
+        return 0
+    if not args.items:
+        print("Enter filenames, directories, or filetypes to blacklist (comma-separated).", file=sys.stderr)
+        return 2
+    status = 0
+    for ok, message in handler.handle_blacklist(args.action, ",".join(args.items)):
+        print(message, file=sys.stdout if ok else sys.stderr)
+        status = status or (0 if ok else 1)
+    return status
+
+
+def cmd_watch(args: argparse.Namespace, config_manager: ConfigManager) -> int:
+    from watcher import DirectoryWatcher
+
+    config = _organizer_config(args, config_manager)
+    organizer = SyncFileOrganizer(config, _duplicate_finder(config_manager, config),
+                                  _content_sniffer(config_manager, config), config_manager.CONFIG_DIR)
+    journal = MoveJournal.for_directory(config_manager.CONFIG_DIR, args.directory)
+    watcher = DirectoryWatcher(args.directory, organizer, settle=args.settle,
+                               interval=args.interval, use_watchdog=not args.poll, journal=journal,
+                               on_moved=lambda moved: print("\n".join(f"{old} -> {new}" for old, new in moved)),
+                               on_error=lambda error: print(error, file=sys.stderr))
+    try:
+        watcher.run(organize_existing=not args.skip_existing)
+    except KeyboardInterrupt:
+        watcher.stop()
+    finally:
+        journal.close()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="file-organizer", description="A versatile file organization tool.")
+    parser.add_argument("--config-dir", default=ConfigManager.CONFIG_DIR,
+                        help="directory holding config.json and the organizer state (default: %(default)s)")
+    subparsers = parser.add_subparsers(dest="command")
+
+    gui = subparsers.add_parser("gui", help="start the graphical interface (default)")
+    gui.set_defaults(handler=cmd_gui)
+
+    organize = subparsers.add_parser("organize", help="sort files into category folders")
+    organize.add_argument("directory")
+    organize.add_argument("--type", help="only organize files with this extension")
+    organize.add_argument("--dry-run", action="store_true", help="print the planned moves without moving anything")
+    plan = organize.add_mutually_exclusive_group()
+    plan.add_argument("--plan", metavar="FILE", help="write the move plan as JSON to FILE")
+    plan.add_argument("--apply-plan", metavar="FILE",
+                      help="carry out a plan saved with --plan instead of planning again "
+                           "(with --dry-run, print it)")
+    organize.add_argument("--parallel", action="store_true", help="move files on a worker pool")
+    organize.add_argument("--workers", type=int, help="worker pool size for --parallel")
+    organize.add_argument("--processes", action="store_true", help="use processes instead of threads for --parallel")
+    organize.add_argument("--dedupe", choices=("off",) + DUPLICATE_POLICIES,
+                          help="what to do with files whose content is already present "
+                               "(default: the config's duplicate_policy)")
+    organize.add_argument("--sniff", action="store_true",
+                          help="classify files with an unknown extension by their content")
+    organize.add_argument("--verify", action="store_true",
+                          help="compare checksums of files copied to another filesystem before deleting them")
+    organize.add_argument("-v", "--verbose", action="store_true", help="print every move")
+    _add_profile_arguments(organize)
+    organize.set_defaults(handler=cmd_organize)
+
+    restore = subparsers.add_parser("restore", help="move organized files back to their original locations")
+    restore.add_argument("directory")
+    _add_profile_arguments(restore)
+    restore.set_defaults(handler=cmd_restore)
+
+    stats = subparsers.add_parser("stats", help="count files, directories and bytes")
+    stats.add_argument("directory")
+    stats.add_argument("--index", action="store_true", help="use and refresh the persistent file index")
+    stats.set_defaults(handler=cmd_stats)
+
+    search = subparsers.add_parser("search", help="find files whose name matches QUERY")
+    search.add_argument("directory")
+    search.add_argument("query")
+    search.add_argument("--mode", choices=SEARCH_MODES, default="substring",
+                        help="how QUERY is matched against file names (default: %(default)s)")
+    search.add_argument("--ext", action="append", help="only files with these extensions (comma-separated)")
+    search.add_argument("--larger-than", metavar="SIZE", help="only files larger than SIZE, e.g. 10MB")
+    search.add_argument("--smaller-than", metavar="SIZE", help="only files smaller than SIZE")
+    search.add_argument("--newer-than", metavar="DAYS", type=float, help="only files modified in the last DAYS days")
+    search.add_argument("--older-than", metavar="DAYS", type=float, help="only files not modified for DAYS days")
+    search.add_argument("--limit", type=int, help="stop after LIMIT results (the best LIMIT with --mode fuzzy)")
+    search.add_argument("--index", action="store_true", help="use and refresh the persistent file index")
+    search.add_argument("--prefix", action="store_true", help="match names starting with QUERY (with --index)")
+    search.set_defaults(handler=cmd_search)
+
+    blacklist = subparsers.add_parser("blacklist", help="manage blacklisted files, directories and filetypes")
+    blacklist.add_argument("action", choices=["add", "remove", "show"])
+    blacklist.add_argument("items", nargs="*", help="filenames, directories, or .filetypes")
+    blacklist.set_defaults(handler=cmd_blacklist)
+
+    watch = subparsers.add_parser("watch", help="continuously organize a directory as files arrive")
+    watch.add_argument("directory")
+    watch.add_argument("--settle", type=float, default=2.0,
+                       help="seconds a file must stay unchanged before it is moved")
+    watch.add_argument("--interval", type=float, default=0.5, help="seconds between batches")
+    watch.add_argument("--poll", action="store_true", help="poll the directory even if watchdog is installed")
+    watch.add_argument("--skip-existing", action="store_true", help="leave files already present alone")
+    watch.add_argument("--dedupe", choices=("off",) + DUPLICATE_POLICIES,
+                       help="what to do with files whose content is already present")
+    watch.add_argument("--sniff", action="store_true",
+                       help="classify files with an unknown extension by their content")
+    watch.add_argument("--verify", action="store_true",
+                       help="compare checksums of files copied to another filesystem before deleting them")
+    watch.set_defaults(handler=cmd_watch)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    handler = getattr(args, "handler", cmd_gui)
+    return handler(args, ConfigManager(args.config_dir))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+import hashlib
+import mmap
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_CACHE_PATH = os.path.join("config", "hash_cache.sqlite3")
+
+PARTIAL_SIZE = 64 * 1024
+CHUNK_SIZE = 1024 * 1024
+MMAP_THRESHOLD = 32 * 1024 * 1024
+
+FileKey = Tuple[int, int, int, int]
+
+
+def file_key(stat: os.stat_result) -> FileKey:
+    return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def hash_file(path: str, size: int, partial: bool = False) -> bytes:
+    hasher = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        if partial:
+            hasher.update(f.read(PARTIAL_SIZE))
+        elif size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                hasher.update(mapped)
+        else:
+            buffer = bytearray(CHUNK_SIZE)
+            view = memoryview(buffer)
+            while True:
+                read = f.readinto(buffer)
+                if not read:
+                    break
+                hasher.update(view[:read])
+    return hasher.digest()
+
+
+class HashCache:
+    # Partial and full content hashes keyed by (device, inode, size, mtime), so
+    # files that have not changed since the last run are never read again.
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS hashes (device INTEGER, inode INTEGER, size INTEGER, mtime INTEGER, "
+            "partial BLOB, full BLOB, PRIMARY KEY (device, inode, size, mtime))")
+
+    def get(self, key: FileKey) -> Tuple[Optional[bytes], Optional[bytes]]:
+        row = self._connection.execute(
+            "SELECT partial, full FROM hashes WHERE device = ? AND inode = ? AND size = ? AND mtime = ?",
+            key).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def put_many(self, rows: Iterable[Tuple[FileKey, Optional[bytes], Optional[bytes]]]) -> None:
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO hashes (device, inode, size, mtime, partial, full) VALUES (?, ?, ?, ?, ?, ?)",
+                [key + (partial, full) for key, partial, full in rows])
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+class DuplicateFinder:
+    # Narrows candidates by size, then by a hash of the first PARTIAL_SIZE
+    # bytes, and only fully hashes files that still collide. Hashing runs on
+    # a thread pool; hashlib releases the GIL for large buffers.
+    def __init__(self, cache: Optional[HashCache] = None, max_workers: Optional[int] = None):
+        self.cache = cache
+        self.max_workers = max_workers or min(8, (os.cpu_count() or 1) + 2)
+
+    def find(self, paths: Iterable[str]) -> Dict[str, str]:
+        # Returns duplicate path -> kept path; the first path listed wins.
+        by_size: Dict[int, List[Tuple[str, FileKey]]] = {}
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            # Empty files are usually placeholders rather than duplicate downloads.
+            if stat.st_size:
+                by_size.setdefault(stat.st_size, []).append((path, file_key(stat)))
+
+        candidates = [group for group in by_size.values() if len(group) > 1]
+        if not candidates:
+            return {}
+
+        cached = {}
+        if self.cache is not None:
+            cached = {key: self.cache.get(key) for group in candidates for _, key in group}
+        computed: Dict[FileKey, List[Optional[bytes]]] = {}
+        duplicates: Dict[str, str] = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for group in candidates:
+                for partial_group in self._regroup(executor, group, cached, computed, partial=True):
+                    if partial_group[0][1][2] <= PARTIAL_SIZE:
+                        # The partial hash already covered the whole file.
+                        full_groups = [partial_group]
+                    else:
+                        full_groups = self._regroup(executor, partial_group, cached, computed, partial=False)
+                    for full_group in full_groups:
+                        keeper = full_group[0][0]
+                        for path, _ in full_group[1:]:
+                            duplicates[path] = keeper
+
+        if self.cache is not None and computed:
+            self.cache.put_many((key, partial, full) for key, (partial, full) in computed.items())
+        return duplicates
+
+    def _regroup(self, executor: ThreadPoolExecutor, group: List[Tuple[str, FileKey]],
+                 cached: Dict[FileKey, Tuple[Optional[bytes], Optional[bytes]]],
+                 computed: Dict[FileKey, List[Optional[bytes]]], partial: bool) -> List[List[Tuple[str, FileKey]]]:
+        slot = 0 if partial else 1
+        digests: List[Optional[bytes]] = []
+        missing = []
+        for index, (path, key) in enumerate(group):
+            digest = computed[key][slot] if key in computed else cached.get(key, (None, None))[slot]
+            digests.append(digest)
+            if digest is None:
+                missing.append(index)
+
+        results = executor.map(lambda index: self._hash(group[index], partial), missing)
+        for index, digest in zip(missing, results):
+            digests[index] = digest
+            if digest is not None:
+                key = group[index][1]
+                entry = computed.setdefault(key, list(cached.get(key, (None, None))))
+                entry[slot] = digest
+
+        by_digest: Dict[bytes, List[Tuple[str, FileKey]]] = {}
+        for item, digest in zip(group, digests):
+            if digest is not None:
+                by_digest.setdefault(digest, []).append(item)
+        return [same for same in by_digest.values() if len(same) > 1]
+
+    @staticmethod
+    def _hash(item: Tuple[str, FileKey], partial: bool) -> Optional[bytes]:
+        path, key = item
+        try:
+            return hash_file(path, key[2], partial)
+        except OSError:
+            return None
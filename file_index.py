@@ -0,0 +1,192 @@
+import os
+import sqlite3
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Set, Tuple
+
+from scanner import FileRecord, get_extension
+
+if TYPE_CHECKING:
+    from organizer import Progress
+
+DEFAULT_INDEX_PATH = os.path.join("config", "file_index.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS roots (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS directories (
+    root_id INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    parent TEXT,
+    mtime REAL,
+    is_link INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (root_id, path)
+);
+CREATE TABLE IF NOT EXISTS files (
+    root_id INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    directory TEXT NOT NULL,
+    name TEXT NOT NULL,
+    name_lower TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    ext TEXT NOT NULL,
+    PRIMARY KEY (root_id, path)
+);
+CREATE INDEX IF NOT EXISTS files_directory ON files (root_id, directory);
+CREATE INDEX IF NOT EXISTS files_name ON files (root_id, name_lower);
+"""
+
+
+class FileIndex:
+    # Persistent index of the files below each refreshed root. A refresh only
+    # re-lists directories whose mtime changed since the last refresh; an
+    # unchanged directory is trusted as a whole, including the sizes and mtimes
+    # of files that were modified in place.
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        # The GUI refreshes and queries from worker threads, one operation at a time.
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def _root_id(self, directory: str, create: bool = False) -> Optional[int]:
+        row = self._connection.execute("SELECT id FROM roots WHERE path = ?", (directory,)).fetchone()
+        if row is not None:
+            return row[0]
+        if not create:
+            return None
+        return self._connection.execute("INSERT INTO roots (path) VALUES (?)", (directory,)).lastrowid
+
+    def refresh(self, directory: str, progress: Optional['Progress'] = None) -> int:
+        # Reports the files listed so far as `scanned`. A cancelled refresh
+        # keeps what it re-listed; the directories it did not reach yet are
+        # marked stale so the next refresh lists them.
+        root = os.path.abspath(directory)
+        connection = self._connection
+        with connection:
+            root_id = self._root_id(root, create=True)
+            stored: Dict[str, Optional[float]] = {}
+            children: Dict[str, List[Tuple[str, bool]]] = {}
+            for path, parent, mtime, is_link in connection.execute(
+                    "SELECT path, parent, mtime, is_link FROM directories WHERE root_id = ?", (root_id,)):
+                stored[path] = mtime
+                children.setdefault(parent, []).append((path, bool(is_link)))
+
+            seen: Set[str] = set()
+            rescanned = 0
+            stack: List[Tuple[str, Optional[str], bool]] = [(root, None, False)]
+            while stack:
+                if progress is not None and progress.cancelled:
+                    connection.executemany(
+                        "INSERT OR IGNORE INTO directories (root_id, path, parent, mtime, is_link) "
+                        "VALUES (?, ?, ?, NULL, 0)",
+                        [(root_id, path, parent) for path, parent, is_link in stack if not is_link])
+                    return rescanned
+                path, parent, is_link = stack.pop()
+                if is_link:
+                    seen.add(path)
+                    continue
+                try:
+                    mtime = os.stat(path).st_mtime
+                except OSError:
+                    continue
+                seen.add(path)
+                if path in stored and stored[path] == mtime:
+                    stack.extend((child, path, link) for child, link in children.get(path, ()))
+                    continue
+
+                rescanned += 1
+                connection.execute("DELETE FROM files WHERE root_id = ? AND directory = ?", (root_id, path))
+                connection.execute(
+                    "INSERT OR REPLACE INTO directories (root_id, path, parent, mtime, is_link) VALUES (?, ?, ?, ?, 0)",
+                    (root_id, path, parent, mtime))
+                rows = self._scan_directory(root_id, path, stack)
+                connection.executemany(
+                    "INSERT OR REPLACE INTO files (root_id, path, directory, name, name_lower, size, mtime, ext) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                if progress is not None:
+                    progress.scanned += len(rows)
+                    progress.report()
+
+            removed = [(root_id, path) for path in stored if path not in seen]
+            connection.executemany("DELETE FROM files WHERE root_id = ? AND directory = ?", removed)
+            connection.executemany("DELETE FROM directories WHERE root_id = ? AND path = ?", removed)
+        return rescanned
+
+    def _scan_directory(self, root_id: int, directory: str, stack: List[Tuple[str, Optional[str], bool]]):
+        rows = []
+        try:
+            iterator = os.scandir(directory)
+        except OSError:
+            return rows
+        with iterator:
+            for entry in iterator:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    is_link = entry.is_symlink()
+                    if is_link:
+                        self._connection.execute(
+                            "INSERT OR REPLACE INTO directories (root_id, path, parent, mtime, is_link) "
+                            "VALUES (?, ?, ?, NULL, 1)", (root_id, entry.path, directory))
+                    stack.append((entry.path, directory, is_link))
+                    continue
+                try:
+                    stat = entry.stat()
+                    size, mtime = stat.st_size, stat.st_mtime
+                except OSError:
+                    size, mtime = 0, 0.0
+                name = entry.name
+                rows.append((root_id, entry.path, directory, name, name.lower(), size, mtime, get_extension(name)))
+        return rows
+
+    def search(self, directory: str, query: str, prefix: bool = False) -> List[str]:
+        root_id = self._root_id(os.path.abspath(directory))
+        if root_id is None:
+            return []
+        query = query.lower()
+        if prefix:
+            rows = self._connection.execute(
+                "SELECT path FROM files WHERE root_id = ? AND name_lower >= ? AND name_lower < ?",
+                (root_id, query, query + "\U0010ffff"))
+        else:
+            rows = self._connection.execute(
+                "SELECT path FROM files WHERE root_id = ? AND instr(name_lower, ?) > 0", (root_id, query))
+        return [path for path, in rows]
+
+    def iter_files(self, directory: str, contains: Optional[str] = None) -> Iterator[FileRecord]:
+        # Streams the indexed files below `directory` without building a list;
+        # `contains` narrows them to lowercase names containing it in SQL.
+        root_id = self._root_id(os.path.abspath(directory))
+        if root_id is None:
+            return
+        if contains:
+            rows = self._connection.execute(
+                "SELECT path, name, ext, size, mtime FROM files WHERE root_id = ? AND instr(name_lower, ?) > 0",
+                (root_id, contains.lower()))
+        else:
+            rows = self._connection.execute(
+                "SELECT path, name, ext, size, mtime FROM files WHERE root_id = ?", (root_id,))
+        for row in rows:
+            yield FileRecord(*row)
+
+    def stats(self, directory: str) -> Tuple[int, int, int]:
+        root = os.path.abspath(directory)
+        root_id = self._root_id(root)
+        if root_id is None:
+            return 0, 0, 0
+        total_files, total_size = self._connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files WHERE root_id = ?", (root_id,)).fetchone()
+        total_dirs, = self._connection.execute(
+            "SELECT COUNT(*) FROM directories WHERE root_id = ? AND path != ?", (root_id, root)).fetchone()
+        return total_files, total_dirs, total_size
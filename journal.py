@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+from typing import Iterable, Iterator, Optional, Tuple
+
+JOURNAL_DIR = "journals"
+
+
+class MoveJournal:
+    # Append-only undo log with one JSON array [old_path, new_path] per line.
+    # Every record is written straight to the OS so a crashed process loses
+    # nothing; fsync is batched to every `sync_every` records and close().
+    def __init__(self, path: str, sync_every: int = 4096):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.sync_every = sync_every
+        self._fd: Optional[int] = None
+        self._unsynced = 0
+
+    @classmethod
+    def for_directory(cls, config_dir: str, directory: str, **kwargs) -> 'MoveJournal':
+        digest = hashlib.sha1(os.path.abspath(directory).encode('utf-8', 'surrogateescape')).hexdigest()
+        return cls(os.path.join(config_dir, JOURNAL_DIR, f"{digest}.jsonl"), **kwargs)
+
+    def __enter__(self) -> 'MoveJournal':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __bool__(self) -> bool:
+        try:
+            return os.path.getsize(self.path) > 0
+        except OSError:
+            return False
+
+    def record(self, old_path: str, new_path: str) -> None:
+        self.record_many(((old_path, new_path),))
+
+    def record_many(self, moves: Iterable[Tuple[str, str]]) -> None:
+        lines = [json.dumps([old_path, new_path]) + "\n" for old_path, new_path in moves]
+        if not lines:
+            return
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        os.write(self._fd, "".join(lines).encode('utf-8', 'surrogateescape'))
+        self._unsynced += len(lines)
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self) -> None:
+        if self._fd is not None and self._unsynced:
+            os.fsync(self._fd)
+        self._unsynced = 0
+
+    def close(self) -> None:
+        if self._fd is not None:
+            self.sync()
+            os.close(self._fd)
+            self._fd = None
+
+    def iter_reverse(self, block_size: int = 1 << 16) -> Iterator[Tuple[int, str, str]]:
+        # Newest first, reading the file backwards in blocks so memory stays
+        # bounded by the block size. Yields (line offset, old_path, new_path).
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            position = f.seek(0, os.SEEK_END)
+            remainder = b""
+            while position > 0:
+                read = min(block_size, position)
+                position -= read
+                f.seek(position)
+                chunk = f.read(read) + remainder
+                lines = chunk.split(b"\n")
+                remainder = lines.pop(0)
+                offset = position + len(chunk)
+                for line in reversed(lines):
+                    offset -= len(line)
+                    entry = self._decode(line)
+                    if entry is not None:
+                        yield (offset,) + entry
+                    offset -= 1
+            entry = self._decode(remainder)
+            if entry is not None:
+                yield (0,) + entry
+
+    @staticmethod
+    def _decode(line: bytes) -> Optional[Tuple[str, str]]:
+        if not line:
+            return None
+        try:
+            old_path, new_path = json.loads(line.decode('utf-8', 'surrogateescape'))
+        except ValueError:
+            # A torn last line from a crash mid-write.
+            return None
+        return old_path, new_path
+
+    def truncate(self, offset: int = 0) -> None:
+        if os.path.exists(self.path):
+            os.truncate(self.path, offset)
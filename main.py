@@ -1,207 +1,106 @@
 import os
-import json
-import shutil
+import time
 import asyncio
-from abc import ABC, abstractmethod
-from typing import List, Tuple, Dict, Optional
+from typing import List, Dict, Optional
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QPushButton,
-    QTreeWidget, QTreeWidgetItem, QFileDialog, QMessageBox, QInputDialog,
+    QTreeView, QFileSystemModel, QFileDialog, QMessageBox, QInputDialog,
     QGridLayout, QSplitter, QLineEdit, QLabel, QListWidget, QGroupBox,
-    QFormLayout, QTabWidget, QHBoxLayout, QComboBox, QDialog, QPlainTextEdit
+    QFormLayout, QTabWidget, QHBoxLayout, QComboBox, QDialog, QPlainTextEdit, QProgressBar,
+    QCheckBox, QListView, QScrollBar, QTreeWidget, QTreeWidgetItem
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QEvent, QModelIndex, QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
 from PyQt5.QtGui import QIcon, QFont, QTextCursor
 from PyQt5.QtGui import QPixmap
 
+from file_index import FileIndex
+from journal import MoveJournal
+from metrics import Metrics
+from preview import FilePreview
+from organizer import (
+    DUPLICATE_POLICIES, BlacklistHandler, ConfigManager, Progress, SyncFileOrganizer, get_directory_stats,
+    restore_files
+)
+from search import SEARCH_MODES, SearchQuery
 
 
-class ConfigManager:
-    CONFIG_DIR = "config"
-    CONFIG_FILE = os.path.join(CONFIG_DIR, "config.json")
-
-    def __init__(self):
-        self.config = self._load_config()
-
-    def _load_config(self) -> Dict[str, List[str]]:
-        if not os.path.exists(self.CONFIG_DIR):
-            os.makedirs(self.CONFIG_DIR)
-        if not os.path.exists(self.CONFIG_FILE):
-            default_config = {
-                "blacklisted_files": [],
-                "blacklisted_directories": [],
-                "blacklisted_filetypes": [],
-                "file_categories": {
-                    'Documents': ['txt', 'doc', 'docx', 'pdf', 'rtf', 'odt'],
-                    'Images': ['jpg', 'jpeg', 'png', 'gif', 'bmp'],
-                    'Audio': ['mp3', 'wav', 'ogg', 'flac'],
-                    'Videos': ['mp4', 'avi', 'mkv', 'mov'],
-                    'Python': ['py'],
-                    'JavaScript': ['js'],
-                    'HTML': ['html', 'htm']
-                }
-            }
-            self.save_config(default_config)
-            return default_config
-        with open(self.CONFIG_FILE, 'r') as f:
-            return json.load(f)
-
-    def save_config(self, config: Optional[Dict[str, List[str]]] = None) -> None:
-        config = config if config else self.config
-        with open(self.CONFIG_FILE, 'w') as f:
-            json.dump(config, f, indent=4)
-
-
-class FileOrganizer(ABC):
-    def __init__(self, config: Dict[str, List[str]]):
-        self._config = config
-
-    @staticmethod
-    def get_file_extension(file_path: str) -> str:
-        return os.path.splitext(file_path)[1][1:].lower()
-
-    @staticmethod
-    def create_folder(directory: str, folder_name: str) -> str:
-        folder_path = os.path.join(directory, folder_name)
-        os.makedirs(folder_path, exist_ok=True)
-        return folder_path
-
-    @staticmethod
-    def move_file(file_path: str, new_path: str) -> Tuple[str, str]:
-        shutil.move(file_path, new_path)
-        return file_path, new_path
-
-    def is_blacklisted(self, file_path: str, filename: str) -> bool:
-        file_extension = self.get_file_extension(filename)
-        is_blacklisted_file = filename in self._config['blacklisted_files']
-        is_blacklisted_dir = any(
-            os.path.commonpath([bl, file_path]) == bl
-            for bl in self._config['blacklisted_directories']
-        )
-        is_blacklisted_type = file_extension in self._config['blacklisted_filetypes']
-        return is_blacklisted_file or is_blacklisted_dir or is_blacklisted_type
-
-    @abstractmethod
-    async def organize_files(self, directory: str, specific_type: Optional[str] = None) -> List[Tuple[str, str]]:
-        pass
-
-
-class SyncFileOrganizer(FileOrganizer):
-    async def organize_files(self, directory: str, specific_type: Optional[str] = None) -> List[Tuple[str, str]]:
-        organized_files = []
-        file_categories = self._config.get("file_categories", {})
-
-        for root, _, files in os.walk(directory):
-            for filename in files:
-                file_path = os.path.join(root, filename)
-                if self.is_blacklisted(file_path, filename):
-                    continue
-
-                file_extension = self.get_file_extension(file_path)
-                if specific_type and file_extension != specific_type:
-                    continue
-
-                category_folder = next(
-                    (cat for cat, exts in file_categories.items() if file_extension in exts), 'Others'
-                )
-
-                base_folder = self.create_folder(directory, category_folder)
-                new_path = os.path.join(base_folder, filename)
-                if category_folder in file_categories and file_extension in file_categories[category_folder]:
-                    extension_folder = self.create_folder(base_folder, file_extension.upper())
-                    new_path = os.path.join(extension_folder, filename)
-
-                organized_files.append(self.move_file(file_path, new_path))
-
-        return organized_files
-
-
-async def delete_empty_folders(path: str) -> None:
-    if not os.path.isdir(path):
-        return
-    for subdir in os.listdir(path):
-        full_path = os.path.join(path, subdir)
-        if os.path.isdir(full_path):
-            await delete_empty_folders(full_path)
-    if not os.listdir(path):
-        os.rmdir(path)
-
-
-async def restore_files(organized_files: List[Tuple[str, str]], current_directory: str) -> None:
-    for original_path, new_path in organized_files:
-        if os.path.exists(new_path):
-            shutil.move(new_path, original_path)
-    await delete_empty_folders(current_directory)
-    QMessageBox.information(None, "File Organizer", "Files restored to their original locations.")
-
-
-def update_tree(tree: QTreeWidget, directory: str) -> None:
-    tree.clear()
-    for item in os.listdir(directory):
-        item_path = os.path.join(directory, item)
-        size = os.path.getsize(item_path) if os.path.isfile(item_path) else ""
-        item_type = "File" if os.path.isfile(item_path) else "Directory"
-        item_widget = QTreeWidgetItem(tree, [item, item_type, f"{size} bytes"])
-        item_widget.setData(0, Qt.ItemDataRole.UserRole, item_path)
-
-
-class BlacklistHandler:
-    def __init__(self, config: Dict[str, List[str]], config_manager: ConfigManager):
-        self._config = config
-        self.config_manager = config_manager
-
-    def handle_blacklist(self, action: str, items: str) -> None:
-        items_list = [item.strip() for item in items.split(",")]
-        for item in items_list:
-            item_type = (
-                'filetypes' if item.startswith('.') else
-                'directories' if os.path.isdir(item) else 'files'
-            )
-            blacklist_key = f'blacklisted_{item_type}'
-
-            if action == 'add':
-                if item not in self._config[blacklist_key]:
-                    self._config[blacklist_key].append(item)
-                    QMessageBox.information(None, "Blacklist", f"Added '{item}' to blacklisted {item_type}.")
-                else:
-                    QMessageBox.warning(None, "Blacklist", f"'{item}' is already in blacklisted {item_type}.")
-            elif action == 'remove':
-                if item in self._config[blacklist_key]:
-                    self._config[blacklist_key].remove(item)
-                    QMessageBox.information(None, "Blacklist", f"Removed '{item}' from blacklisted {item_type}.")
-                else:
-                    QMessageBox.warning(None, "Blacklist", f"'{item}' not found in blacklisted {item_type}.")
-        self.config_manager.save_config()
-
-    def show_blacklist(self) -> None:
-        blacklist_message = ""
-        for key in ['blacklisted_files', 'blacklisted_directories', 'blacklisted_filetypes']:
-            if self._config[key]:
-                blacklist_message += f"Blacklisted {key.split('_')[1].capitalize()}: " + ", ".join(self._config[key]) + "\n"
-        if not blacklist_message:
-            blacklist_message = "All blacklists are empty."
-        QMessageBox.information(None, "Blacklist", blacklist_message)
-
-    def reset_to_default(self) -> None:
-        self._config = ConfigManager().config
-        self.config_manager.save_config(self._config)
-
-
-def get_directory_stats(directory: str) -> Tuple[int, int, int]:
-    total_files, total_dirs, total_size = 0, 0, 0
-    for root, dirs, files in os.walk(directory):
-        total_dirs += len(dirs)
-        total_files += len(files)
-        total_size += sum(os.path.getsize(os.path.join(root, name)) for name in files)
-    return total_files, total_dirs, total_size
+class WorkerSignals(QObject):
+    progress = pyqtSignal(int, int, int, int)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    results = pyqtSignal(list)
 
 
-def search_files(directory: str, query: str) -> List[str]:
-    return [
-        os.path.join(root, file)
-        for root, _, files in os.walk(directory)
-        for file in files if query.lower() in file.lower()
-    ]
+class Worker(QRunnable):
+    # Runs a long operation on the thread pool. The operation receives a
+    # Progress whose throttled reports are forwarded as Qt signals, and which
+    # the Cancel button uses to stop it between files.
+    def __init__(self, function, *args, **kwargs):
+        super().__init__()
+        self.signals = WorkerSignals()
+        self.progress = Progress(self._emit_progress)
+        self._function = function
+        self._args = args
+        self._kwargs = kwargs
+
+    def _emit_progress(self, progress: Progress) -> None:
+        self.signals.progress.emit(progress.scanned, progress.moved, progress.bytes, progress.total)
+
+    def run(self) -> None:
+        try:
+            result = self._function(*self._args, progress=self.progress, **self._kwargs)
+            if asyncio.iscoroutine(result):
+                result = asyncio.run(result)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.progress.report(force=True)
+        self.signals.finished.emit(result)
+
+
+class StreamWorker(QRunnable):
+    # Pulls up to `limit` items from an iterator on the thread pool and emits
+    # them in batches: the first one right away, then at most one batch per
+    # BATCH_INTERVAL seconds. The iterator is left suspended after `limit`
+    # items, so a later StreamWorker can continue where this one stopped.
+    # `finished` carries True once the iterator is exhausted.
+    BATCH_INTERVAL = 0.05
+
+    def __init__(self, iterator, limit: int):
+        super().__init__()
+        self.signals = WorkerSignals()
+        self._iterator = iterator
+        self._limit = limit
+
+    def run(self) -> None:
+        batch = []
+        count = 0
+        last_emit = 0.0
+        exhausted = True
+        try:
+            for item in self._iterator:
+                batch.append(item)
+                count += 1
+                now = time.monotonic()
+                if now - last_emit >= self.BATCH_INTERVAL:
+                    self.signals.results.emit(batch)
+                    batch = []
+                    last_emit = now
+                if count >= self._limit:
+                    exhausted = False
+                    break
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        if batch:
+            self.signals.results.emit(batch)
+        self.signals.finished.emit(exhausted)
+
+
+def update_tree(tree: QTreeView, directory: str) -> None:
+    # QFileSystemModel lists and stats entries lazily on its own gatherer thread
+    # and follows changes on disk, so switching directories is all that is needed.
+    tree.setRootIndex(tree.model().setRootPath(directory))
 
 
 class SettingsPanel(QWidget):
@@ -238,6 +137,28 @@ class SettingsPanel(QWidget):
         categories_group.setLayout(categories_layout)
         layout.addWidget(categories_group)
 
+        classification_group = QGroupBox("Classification")
+        classification_layout = QFormLayout()
+        self.duplicate_policy_input = QComboBox()
+        self.duplicate_policy_input.addItems(("off",) + DUPLICATE_POLICIES)
+        self.duplicate_policy_input.setCurrentText(self.config.get('duplicate_policy', 'off'))
+        self.duplicate_policy_input.currentTextChanged.connect(self.set_duplicate_policy)
+        classification_layout.addRow(QLabel("When content already exists:"), self.duplicate_policy_input)
+        self.content_sniffing_input = QCheckBox("Detect the type of files with unknown extensions")
+        self.content_sniffing_input.setChecked(bool(self.config.get('content_sniffing')))
+        self.content_sniffing_input.toggled.connect(self.set_content_sniffing)
+        classification_layout.addRow(self.content_sniffing_input)
+        classification_group.setLayout(classification_layout)
+        layout.addWidget(classification_group)
+
+    def set_duplicate_policy(self, policy: str):
+        self.config['duplicate_policy'] = policy
+        self.config_manager.save_config(self.config)
+
+    def set_content_sniffing(self, enabled: bool):
+        self.config['content_sniffing'] = enabled
+        self.config_manager.save_config(self.config)
+
     def add_update_category(self):
         category_name = self.category_name_input.text().strip()
         extensions = [ext.strip() for ext in self.category_ext_input.text().split(',') if ext.strip()]
@@ -275,24 +196,332 @@ class SettingsPanel(QWidget):
 
 
 class FileContentDialog(QDialog):
+    # Only the visible page plus READ_AHEAD pages are decoded at a time, so
+    # opening a file takes the same time and memory whatever its size.
+    READ_AHEAD = 4
+
     def __init__(self, path, parent=None):
         super().__init__(parent)
         self.setWindowTitle(f"Contents of {os.path.basename(path)}")
         self.resize(800, 600)
+        self.preview = None
+        self.page = []
+        self.page_start = 0
+        self.page_complete = False
         layout = QVBoxLayout(self)
+        if os.path.isdir(path):
+            # Listed lazily by the model, like the main tree.
+            model = QFileSystemModel(self)
+            view = QListView(self)
+            view.setModel(model)
+            view.setRootIndex(model.setRootPath(path))
+            layout.addWidget(view)
+            return
+
         self.text_edit = QPlainTextEdit(self)
         self.text_edit.setReadOnly(True)
-        layout.addWidget(self.text_edit)
+        self.text_edit.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.text_edit.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.text_edit.installEventFilter(self)
+        self.text_edit.viewport().installEventFilter(self)
+        self.scroll_bar = QScrollBar(Qt.Vertical, self)
+        self.scroll_bar.valueChanged.connect(self.render_page)
+        view_layout = QHBoxLayout()
+        view_layout.addWidget(self.text_edit)
+        view_layout.addWidget(self.scroll_bar)
+        layout.addLayout(view_layout)
+        self.status_label = QLabel(self)
+        layout.addWidget(self.status_label)
+        self.index_timer = QTimer(self)
+        self.index_timer.timeout.connect(self.update_index)
         self.load_content(path)
 
     def load_content(self, path):
-        if os.path.isdir(path):
-            contents = "\n".join(os.listdir(path))
+        try:
+            self.preview = FilePreview(path)
+        except (OSError, ValueError) as e:
+            self.text_edit.setPlainText(f"Could not open {path}: {e}")
+            return
+        if self.preview.binary:
+            font = QFont("Monospace")
+            font.setStyleHint(QFont.TypeWriter)
+            self.text_edit.setFont(font)
         else:
-            with open(path, 'r', errors='ignore') as f:
-                contents = f.read()
-        self.text_edit.setPlainText(contents)
-        
+            self.preview.start_indexing()
+            self.index_timer.start(200)
+        self.update_index()
+
+    def update_index(self):
+        preview = self.preview
+        total = preview.row_count if preview.binary else preview.line_count
+        self.scroll_bar.setMaximum(max(0, total - 1))
+        if preview.binary:
+            status = f"{preview.size:,} bytes, binary file shown as hex"
+        else:
+            status = f"{preview.size:,} bytes, {preview.line_count:,} lines"
+            if not preview.indexed:
+                status += " (counting lines...)"
+        self.status_label.setText(status)
+        if preview.indexed:
+            self.index_timer.stop()
+        self.render_page()
+
+    def page_size(self):
+        return max(1, self.text_edit.viewport().height() // self.text_edit.fontMetrics().lineSpacing())
+
+    def render_page(self):
+        if self.preview is None:
+            return
+        first = self.scroll_bar.value()
+        size = self.page_size()
+        offset = first - self.page_start
+        if offset < 0 or (offset + size > len(self.page) and not self.page_complete):
+            # Decode from a page above so scrolling back up is served too.
+            self.page_start = max(0, first - size)
+            count = size * (self.READ_AHEAD + 1)
+            read = self.preview.hex_rows if self.preview.binary else self.preview.lines
+            self.page = read(self.page_start, count)
+            self.page_complete = len(self.page) < count
+            offset = first - self.page_start
+        self.text_edit.setPlainText("\n".join(self.page[offset:offset + size]))
+
+    def eventFilter(self, watched, event):
+        if self.preview is not None:
+            step = None
+            if event.type() == QEvent.Wheel:
+                step = -event.angleDelta().y() // 40
+            elif event.type() == QEvent.KeyPress:
+                step = {
+                    Qt.Key_Up: -1, Qt.Key_Down: 1,
+                    Qt.Key_PageUp: -self.page_size(), Qt.Key_PageDown: self.page_size(),
+                    Qt.Key_Home: -self.scroll_bar.maximum(), Qt.Key_End: self.scroll_bar.maximum(),
+                }.get(event.key())
+            if step is not None:
+                self.scroll_bar.setValue(self.scroll_bar.value() + step)
+                return True
+        return super().eventFilter(watched, event)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.render_page()
+
+    def done(self, result):
+        if self.preview is not None:
+            self.index_timer.stop()
+            self.preview.close()
+            self.preview = None
+        super().done(result)
+
+class MetricsPanel(QGroupBox):
+    # Where the last organize or restore spent its time, phase by phase.
+    COLUMNS = ("Phase", "Count", "Total s", "Mean ms", "p95 ms", "Max ms")
+
+    def __init__(self, parent=None):
+        super().__init__("Last Run", parent)
+        layout = QVBoxLayout(self)
+        self.table = QTreeWidget()
+        self.table.setHeaderLabels(self.COLUMNS)
+        self.table.setRootIsDecorated(False)
+        layout.addWidget(self.table)
+        self.summary_label = QLabel("Organize or restore files to see where the time goes.")
+        self.summary_label.setWordWrap(True)
+        layout.addWidget(self.summary_label)
+
+    def show_metrics(self, title: str, metrics: Metrics):
+        metrics.stop()
+        self.table.clear()
+        for phase in metrics.ordered_phases():
+            stats = metrics.phases[phase]
+            mean = stats.total / stats.count * 1000 if stats.count else 0.0
+            self.table.addTopLevelItem(QTreeWidgetItem([
+                phase, f"{stats.count:,}", f"{stats.total:.3f}", f"{mean:.3f}",
+                f"{stats.percentile(0.95) * 1000:.3f}", f"{stats.max * 1000:.3f}",
+            ]))
+        parts = [f"{title} took {metrics.wall_seconds:.2f} s"]
+        parts.extend(f"{counter.replace('_', ' ')}: {value:,}" for counter, value in sorted(metrics.counters.items()))
+        self.summary_label.setText(", ".join(parts))
+
+
+class SearchDialog(QDialog):
+    # Results are shown as the walk finds them, PAGE_SIZE at a time; "Load
+    # more" resumes the same walk instead of starting over.
+    PAGE_SIZE = 500
+    COLUMNS = ("Name", "Folder", "Size", "Modified", "Score")
+
+    def __init__(self, organizer: SyncFileOrganizer, directory: str, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Search {directory}")
+        self.resize(900, 600)
+        self.organizer = organizer
+        self.directory = directory
+        self.results = None
+        self.progress = None
+        self.worker = None
+        self.shown = 0
+
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+        self.query_input = QLineEdit()
+        self.query_input.returnPressed.connect(self.start_search)
+        self.mode_input = QComboBox()
+        self.mode_input.addItems(SEARCH_MODES)
+        self.ext_input = QLineEdit()
+        self.ext_input.setPlaceholderText("e.g. pdf, docx")
+        self.larger_input = QLineEdit()
+        self.larger_input.setPlaceholderText("e.g. 10MB")
+        self.smaller_input = QLineEdit()
+        self.newer_input = QLineEdit()
+        self.newer_input.setPlaceholderText("days")
+        self.older_input = QLineEdit()
+        self.older_input.setPlaceholderText("days")
+        form.addRow(QLabel("Search for:"), self.query_input)
+        form.addRow(QLabel("Match as:"), self.mode_input)
+        form.addRow(QLabel("Extensions (comma-separated):"), self.ext_input)
+        form.addRow(QLabel("Larger than:"), self.larger_input)
+        form.addRow(QLabel("Smaller than:"), self.smaller_input)
+        form.addRow(QLabel("Modified in the last:"), self.newer_input)
+        form.addRow(QLabel("Not modified for:"), self.older_input)
+        layout.addLayout(form)
+
+        self.results_view = QTreeWidget()
+        self.results_view.setHeaderLabels(self.COLUMNS)
+        self.results_view.setRootIsDecorated(False)
+        self.results_view.setUniformRowHeights(True)
+        self.results_view.setColumnWidth(0, 300)
+        self.results_view.itemDoubleClicked.connect(self.view_result)
+        layout.addWidget(self.results_view)
+
+        buttons = QHBoxLayout()
+        self.status_label = QLabel()
+        self.search_button = QPushButton("Search")
+        self.search_button.clicked.connect(self.start_search)
+        self.more_button = QPushButton("Load More")
+        self.more_button.clicked.connect(self.load_more)
+        self.stop_button = QPushButton("Stop")
+        self.stop_button.clicked.connect(self.stop_search)
+        buttons.addWidget(self.status_label, 1)
+        buttons.addWidget(self.search_button)
+        buttons.addWidget(self.more_button)
+        buttons.addWidget(self.stop_button)
+        layout.addLayout(buttons)
+        self.status_timer = QTimer(self)
+        self.status_timer.timeout.connect(self.update_status)
+        self.set_running(False)
+        self.more_button.setEnabled(False)
+
+    def build_query(self) -> SearchQuery:
+        def days(line_edit):
+            text = line_edit.text().strip()
+            return float(text) if text else None
+
+        return SearchQuery(
+            self.query_input.text(), self.mode_input.currentText(),
+            [ext for ext in self.ext_input.text().split(",") if ext.strip()],
+            self.larger_input.text().strip(), self.smaller_input.text().strip(),
+            days(self.newer_input), days(self.older_input))
+
+    def start_search(self):
+        if self.worker is not None:
+            return
+        try:
+            query = self.build_query()
+        except ValueError as e:
+            self.status_label.setText(str(e))
+            return
+        self.close_results()
+        self.results_view.clear()
+        self.shown = 0
+        # Ranked results are kept sorted by score as they arrive; the others in walk order.
+        ranked = query.mode == 'fuzzy'
+        self.results_view.setColumnHidden(len(self.COLUMNS) - 1, not ranked)
+        self.results_view.setSortingEnabled(ranked)
+        if ranked:
+            self.results_view.sortByColumn(len(self.COLUMNS) - 1, Qt.DescendingOrder)
+        self.progress = Progress()
+        self.results = self.organizer.search(self.directory, query, progress=self.progress, with_stat=True)
+        self.load_more()
+
+    def load_more(self):
+        if self.worker is not None or self.results is None:
+            return
+        self.worker = StreamWorker(self.results, self.PAGE_SIZE)
+        self.worker.signals.results.connect(self.add_results)
+        self.worker.signals.finished.connect(self.on_page_done)
+        self.worker.signals.failed.connect(self.on_failed)
+        self.set_running(True)
+        QThreadPool.globalInstance().start(self.worker)
+
+    def add_results(self, results):
+        items = []
+        for result in results:
+            item = QTreeWidgetItem([
+                result.name, os.path.dirname(result.path),
+                f"{result.size:,}" if result.size is not None else "",
+                time.strftime("%Y-%m-%d %H:%M", time.localtime(result.mtime)) if result.mtime is not None else "",
+            ])
+            item.setData(len(self.COLUMNS) - 1, Qt.DisplayRole, result.score)
+            item.setData(0, Qt.UserRole, result.path)
+            items.append(item)
+        self.results_view.addTopLevelItems(items)
+        self.shown += len(items)
+        self.update_status()
+
+    def on_page_done(self, exhausted: bool):
+        self.worker = None
+        self.set_running(False)
+        if exhausted or self.progress.cancelled:
+            self.close_results()
+        self.more_button.setEnabled(self.results is not None)
+        self.update_status()
+
+    def on_failed(self, message: str):
+        self.worker = None
+        self.set_running(False)
+        self.close_results()
+        self.status_label.setText(message)
+
+    def set_running(self, running: bool):
+        self.search_button.setEnabled(not running)
+        self.more_button.setEnabled(False)
+        self.stop_button.setEnabled(running)
+        if running:
+            self.status_timer.start(100)
+        else:
+            self.status_timer.stop()
+
+    def update_status(self):
+        if self.progress is None:
+            return
+        status = f"{self.shown:,} results, {self.progress.scanned:,} files searched"
+        if self.worker is not None:
+            status += "..."
+        elif self.results is not None:
+            status += f" (showing the first {self.shown:,}; load more for the rest)"
+        elif self.progress.cancelled:
+            status += " (stopped)"
+        self.status_label.setText(status)
+
+    def stop_search(self):
+        if self.progress is not None:
+            self.progress.cancel()
+
+    def close_results(self):
+        # A suspended walk holds open directory handles until it is closed.
+        if self.results is not None:
+            self.results.close()
+            self.results = None
+
+    def view_result(self, item: QTreeWidgetItem):
+        dialog = FileContentDialog(item.data(0, Qt.UserRole), self)
+        dialog.exec()
+
+    def done(self, result):
+        self.stop_search()
+        if self.worker is None:
+            self.close_results()
+        super().done(result)
+
+
 class BuyCoffeeDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -311,15 +540,20 @@ class BuyCoffeeDialog(QDialog):
 
 
 class FileOrganizerGUI(QMainWindow):
-    def __init__(self):
+    def __init__(self, config_dir: Optional[str] = None):
         super().__init__()
         self.current_directory = os.getcwd()
-        self.organized_files = []
+        self.journals: Dict[str, MoveJournal] = {}
+        self.worker = None
+        self.run_metrics = None
+        self.thread_pool = QThreadPool.globalInstance()
 
-        self.config_manager = ConfigManager()
+        self.config_manager = ConfigManager(config_dir)
         self.config = self.config_manager.config
-        self.organizer = SyncFileOrganizer(self.config)
+        self.organizer = SyncFileOrganizer(self.config, state_dir=self.config_manager.CONFIG_DIR)
+        self.config_manager.subscribe(lambda _: self.organizer.rebuild_rules())
         self.blacklist_handler = BlacklistHandler(self.config, self.config_manager)
+        self.file_index = FileIndex(os.path.join(self.config_manager.CONFIG_DIR, "file_index.sqlite3"))
 
         self.init_ui()
         update_tree(self.tree, self.current_directory)
@@ -341,10 +575,13 @@ class FileOrganizerGUI(QMainWindow):
         self.tree_and_actions = QWidget()
         self.tree_and_actions_layout = QVBoxLayout(self.tree_and_actions)
 
-        self.tree = QTreeWidget()
-        self.tree.setHeaderLabels(["Name", "Type", "Size"])
+        self.tree_model = QFileSystemModel(self)
+        self.tree_model.setOption(QFileSystemModel.Option.DontUseCustomDirectoryIcons)
+        self.tree = QTreeView()
+        self.tree.setModel(self.tree_model)
+        self.tree.setUniformRowHeights(True)
         self.tree.setColumnWidth(0, 250)  # Adjust the first column width
-        self.tree.itemDoubleClicked.connect(self.view_item_content)
+        self.tree.doubleClicked.connect(self.view_item_content)
         self.tree_and_actions_layout.addWidget(self.tree)
 
         self.add_buttons_panel()
@@ -358,6 +595,8 @@ class FileOrganizerGUI(QMainWindow):
         self.settings_toggle_button.clicked.connect(self.toggle_settings_panel)
         self.settings_layout.addWidget(self.settings_toggle_button)
         self.settings_layout.addWidget(self.settings_panel)
+        self.metrics_panel = MetricsPanel()
+        self.settings_layout.addWidget(self.metrics_panel)
         self.splitter.addWidget(self.settings_widget)
         
 
@@ -370,8 +609,8 @@ class FileOrganizerGUI(QMainWindow):
         self.buttons_layout = QGridLayout(self.buttons_widget)
         self.add_button("Buy Me A Coffee", self.buttons_layout, 0, 0, self.on_buy_me_a_coffee, colspan=2)
         self.add_button("Open Directory", self.buttons_layout, 1, 0, lambda: asyncio.run(self.open_directory()))
-        self.add_button("Organize Files", self.buttons_layout, 1, 1, lambda: asyncio.run(self.on_organize()))
-        self.add_button("Restore Files", self.buttons_layout, 2, 0, lambda: asyncio.run(self.on_restore()))
+        self.add_button("Organize Files", self.buttons_layout, 1, 1, self.on_organize)
+        self.add_button("Restore Files", self.buttons_layout, 2, 0, self.on_restore)
         self.add_button("Stats", self.buttons_layout, 2, 1, self.on_stats)
         self.add_button("Search", self.buttons_layout, 3, 0, self.on_search)
         self.add_button("Blacklist", self.buttons_layout, 3, 1, self.on_blacklist)
@@ -380,6 +619,64 @@ class FileOrganizerGUI(QMainWindow):
         self.add_button("Exit", self.buttons_layout, 5, 0, self.close, colspan=2)
     
         self.tree_and_actions_layout.addWidget(self.buttons_widget)
+        self.add_progress_panel()
+
+    def add_progress_panel(self):
+        self.progress_widget = QWidget()
+        self.progress_layout = QHBoxLayout(self.progress_widget)
+        self.progress_bar = QProgressBar()
+        self.progress_label = QLabel()
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.on_cancel)
+        self.progress_layout.addWidget(self.progress_bar)
+        self.progress_layout.addWidget(self.progress_label)
+        self.progress_layout.addWidget(self.cancel_button)
+        self.progress_widget.hide()
+        self.tree_and_actions_layout.addWidget(self.progress_widget)
+
+    def run_in_background(self, title: str, on_finished, function, *args, **kwargs) -> None:
+        if self.worker is not None:
+            QMessageBox.warning(self, title, "Another operation is still running.")
+            return
+        self.worker = Worker(function, *args, **kwargs)
+        self.worker.signals.progress.connect(self.on_progress)
+        self.worker.signals.finished.connect(lambda result: self.on_worker_done(on_finished, result))
+        self.worker.signals.failed.connect(lambda message: self.on_worker_failed(title, message))
+        self.progress_bar.setRange(0, 0)
+        self.progress_label.setText(f"{title}...")
+        self.buttons_widget.setEnabled(False)
+        self.progress_widget.show()
+        self.thread_pool.start(self.worker)
+
+    def on_progress(self, scanned: int, moved: int, size: int, total: int) -> None:
+        if total:
+            self.progress_bar.setRange(0, total)
+            self.progress_bar.setValue(moved)
+        parts = [f"Scanned {scanned:,}"] if scanned else []
+        if total:
+            parts.append(f"moved {moved:,} of {total:,}")
+        if size:
+            parts.append(f"{size:,} bytes")
+        self.progress_label.setText(", ".join(parts))
+
+    def on_cancel(self) -> None:
+        if self.worker is not None:
+            self.worker.progress.cancel()
+            self.progress_label.setText("Cancelling...")
+
+    def finish_worker(self) -> bool:
+        cancelled = self.worker.progress.cancelled
+        self.worker = None
+        self.progress_widget.hide()
+        self.buttons_widget.setEnabled(True)
+        return cancelled
+
+    def on_worker_done(self, on_finished, result) -> None:
+        on_finished(result, self.finish_worker())
+
+    def on_worker_failed(self, title: str, message: str) -> None:
+        self.finish_worker()
+        QMessageBox.critical(self, title, message)
 
 
     def on_buy_me_a_coffee(self) -> None:
@@ -406,39 +703,65 @@ class FileOrganizerGUI(QMainWindow):
             self.current_directory = directory
             update_tree(self.tree, self.current_directory)
 
-    async def on_organize(self) -> None:
+    def on_organize(self) -> None:
         filetype, ok = QInputDialog.getText(self, "File Organizer", "Enter file type to organize (leave empty for all):")
         if ok:
-            self.organized_files.extend(await self.organizer.organize_files(self.current_directory, filetype))
-            update_tree(self.tree, self.current_directory)
+            self.run_metrics = self.organizer.metrics = Metrics()
+            self.run_in_background("File Organizer", self.on_organized,
+                                   self.organizer.organize_files, self.current_directory, filetype,
+                                   journal=self.journal_for(self.current_directory))
+
+    def journal_for(self, directory: str) -> MoveJournal:
+        if directory not in self.journals:
+            self.journals[directory] = MoveJournal.for_directory(self.config_manager.CONFIG_DIR, directory)
+        return self.journals[directory]
+
+    def on_organized(self, moved, cancelled: bool) -> None:
+        self.metrics_panel.show_metrics("Organizing", self.run_metrics)
+        if cancelled:
+            QMessageBox.information(self, "File Organizer", f"File organization cancelled after {len(moved):,} files.")
+        else:
             QMessageBox.information(self, "File Organizer", "File organization completed.")
 
-    async def on_restore(self) -> None:
-        if self.organized_files:
-            await restore_files(self.organized_files, self.current_directory)
-            update_tree(self.tree, self.current_directory)
+    def on_restore(self) -> None:
+        journal = self.journal_for(self.current_directory)
+        if journal:
+            self.run_metrics = Metrics()
+            self.run_in_background("Restore Files", self.on_restored,
+                                   restore_files, journal, self.current_directory, metrics=self.run_metrics)
         else:
             QMessageBox.warning(self, "Restore Files", "No files to restore. Use 'Organize' first.")
 
+    def on_restored(self, restored: int, cancelled: bool) -> None:
+        self.metrics_panel.show_metrics("Restoring", self.run_metrics)
+        if cancelled:
+            QMessageBox.information(self, "File Organizer", f"Restore cancelled after {restored:,} files.")
+        else:
+            QMessageBox.information(self, "File Organizer", "Files restored to their original locations.")
+
     def on_stats(self) -> None:
-        files, dirs, size = get_directory_stats(self.current_directory)
-        QMessageBox.information(self, "Directory Stats", f"Files: {files}, Directories: {dirs}, Total size: {size:,} bytes")
+        self.run_in_background("Directory Stats", self.on_stats_ready,
+                               get_directory_stats, self.current_directory, self.file_index)
+
+    def on_stats_ready(self, stats, cancelled: bool) -> None:
+        files, dirs, size = stats
+        prefix = "Cancelled. Partial counts: " if cancelled else ""
+        QMessageBox.information(self, "Directory Stats", f"{prefix}Files: {files}, Directories: {dirs}, Total size: {size:,} bytes")
 
     def on_search(self) -> None:
-        query, ok = QInputDialog.getText(self, "Search Files", "Enter search query:")
-        if ok:
-            results = search_files(self.current_directory, query)
-            if results:
-                QMessageBox.information(self, "Search Results", "\n".join(results))
-            else:
-                QMessageBox.information(self, "Search Results", "No files found matching the query.")
+        dialog = SearchDialog(self.organizer, self.current_directory, self)
+        dialog.exec()
 
     def on_blacklist(self) -> None:
         action, ok = QInputDialog.getText(self, "Blacklist Action", "Enter action (add/remove):")
         if ok and action in ['add', 'remove']:
             items, ok_items = QInputDialog.getText(self, "Blacklist Items", "Enter filenames, directories, or filetypes to blacklist (comma-separated):")
             if ok_items:
-                self.blacklist_handler.handle_blacklist(action, items)
+                for ok_item, message in self.blacklist_handler.handle_blacklist(action, items):
+                    if ok_item:
+                        QMessageBox.information(self, "Blacklist", message)
+                    else:
+                        QMessageBox.warning(self, "Blacklist", message)
         else:
             QMessageBox.warning(self, "Blacklist", "Invalid action. Use 'add' or 'remove'.")
 
@@ -457,18 +780,18 @@ class FileOrganizerGUI(QMainWindow):
         self.settings_panel.categories_list.addItems(self.config['file_categories'].keys())
 
     def on_show_blacklist(self) -> None:
-        self.blacklist_handler.show_blacklist()
+        QMessageBox.information(self, "Blacklist", self.blacklist_handler.describe_blacklist())
 
-    def view_item_content(self, item: QTreeWidgetItem, column: int):
-        path = item.data(0, Qt.ItemDataRole.UserRole)
+    def view_item_content(self, index: QModelIndex):
+        path = self.tree_model.filePath(index)
         if path:
             dialog = FileContentDialog(path, self)
             dialog.exec()
 
 
-def main():
+def main(config_dir: Optional[str] = None):
     app = QApplication([])
-    gui = FileOrganizerGUI()
+    gui = FileOrganizerGUI(config_dir)
     gui.show()
     app.exec()
 
@@ -0,0 +1,152 @@
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+T = TypeVar('T')
+
+# Phases in the order a run goes through them; summaries list them this way.
+PHASES = ('scan', 'classify', 'sniff', 'dedupe', 'mkdir', 'move', 'copy', 'restore', 'cleanup')
+# Histogram bucket i counts operations that took less than 2**i microseconds.
+_BUCKETS = 40
+
+
+class PhaseStats:
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets: List[int] = [0] * _BUCKETS
+
+    def add(self, seconds: float, count: int = 1) -> None:
+        # A block covering `count` operations is recorded as `count`
+        # operations of the average duration.
+        self.count += count
+        self.total += seconds
+        each = seconds / count if count else seconds
+        if each > self.max:
+            self.max = each
+        self.buckets[min(int(each * 1e6).bit_length(), _BUCKETS - 1)] += count
+
+    def percentile(self, fraction: float) -> float:
+        # Upper bound of the bucket holding the operation at `fraction`.
+        wanted = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= wanted:
+                return min((1 << bucket) / 1e6, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "count": self.count,
+            "total_seconds": self.total,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(0.5) * 1000,
+            "p95_ms": self.percentile(0.95) * 1000,
+            "max_ms": self.max * 1000,
+            # Upper bound in microseconds -> operations.
+            "histogram_us": {str(1 << bucket): count for bucket, count in enumerate(self.buckets) if count},
+        }
+
+
+class Metrics:
+    # Per-phase counts, times and duration histograms of one run, plus plain
+    # counters. Instrumented code takes an Optional[Metrics] and skips all
+    # timing when it is None, so a run without metrics pays one `is None`
+    # check per operation. Safe to update from worker threads.
+    def __init__(self):
+        self.phases: Dict[str, PhaseStats] = {}
+        self.counters: Dict[str, int] = {}
+        # Free-form description of the run (command, directory, ...) for the JSON.
+        self.info: Dict[str, object] = {}
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self._wall: Optional[float] = None
+        # Imported here so that importing this module stays cheap for the CLI.
+        import threading
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float, count: int = 1) -> None:
+        with self._lock:
+            stats = self.phases.get(phase)
+            if stats is None:
+                stats = self.phases[phase] = PhaseStats()
+            stats.add(seconds, count)
+
+    def count(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    @contextmanager
+    def timer(self, phase: str, count: int = 1) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - start, count)
+
+    def iterate(self, phase: str, iterable: Iterable[T]) -> Iterator[T]:
+        # Times each step of `iterable`, e.g. the scandir and stat work behind
+        # every record of a scan, separately from what the caller does with it.
+        iterator = iter(iterable)
+        clock = time.perf_counter
+        while True:
+            start = clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(phase, clock() - start, 0)
+                return
+            self.add(phase, clock() - start)
+            yield item
+
+    def stop(self) -> None:
+        if self._wall is None:
+            self._wall = time.perf_counter() - self._start
+
+    @property
+    def wall_seconds(self) -> float:
+        return self._wall if self._wall is not None else time.perf_counter() - self._start
+
+    def ordered_phases(self) -> List[str]:
+        known = [phase for phase in PHASES if phase in self.phases]
+        return known + sorted(phase for phase in self.phases if phase not in PHASES)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "info": self.info,
+            "started": self.started,
+            "wall_seconds": self.wall_seconds,
+            "phases": {phase: self.phases[phase].to_dict() for phase in self.ordered_phases()},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def summary(self) -> str:
+        lines = [f"{'phase':<10} {'count':>10} {'total s':>9} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+        for phase in self.ordered_phases():
+            stats = self.phases[phase]
+            mean = stats.total / stats.count * 1000 if stats.count else 0.0
+            lines.append(f"{phase:<10} {stats.count:>10,} {stats.total:>9.3f} {mean:>9.3f} "
+                         f"{stats.percentile(0.5) * 1000:>9.3f} {stats.percentile(0.95) * 1000:>9.3f} "
+                         f"{stats.max * 1000:>9.3f}")
+        for counter, value in sorted(self.counters.items()):
+            lines.append(f"{counter:<20} {value:>10,}")
+        lines.append(f"{'wall time':<20} {self.wall_seconds:>10.3f} s")
+        return "\n".join(lines)
+
+
+def timed(metrics: Optional[Metrics], phase: str, count: int = 1) -> ContextManager[None]:
+    # For whole blocks (a mkdir, a sniffing pass); a no-op without metrics.
+    return metrics.timer(phase, count) if metrics is not None else nullcontext()
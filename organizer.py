@@ -0,0 +1,980 @@
+import os
+import errno
+import heapq
+import json
+import shutil
+import time
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Callable, FrozenSet, Iterable, Iterator, List, Tuple, Dict, Optional, Set
+
+import scanner
+from metrics import Metrics, timed
+from rules import RuleEngine
+from scanner import FileRecord
+from search import SearchQuery, SearchResult, iter_search
+
+# asyncio, concurrent.futures and sqlite3 are imported where they are used so
+# that the CLI starts quickly for commands that do not need them.
+if TYPE_CHECKING:
+    import asyncio
+    from concurrent.futures import Executor
+    from dedupe import DuplicateFinder
+    from file_index import FileIndex
+    from journal import MoveJournal
+    from sniff import ContentSniffer
+    from transfer import TransferPool
+
+# What to do with a file whose content already exists among the files being
+# organized; anything else in the config's "duplicate_policy" disables the check.
+DUPLICATE_POLICIES = ('skip', 'hardlink', 'move')
+DUPLICATES_FOLDER = 'Duplicates'
+
+
+class ConfigManager:
+    CONFIG_DIR = "config"
+    CONFIG_FILE = os.path.join(CONFIG_DIR, "config.json")
+
+    def __init__(self, config_dir: Optional[str] = None):
+        if config_dir is not None:
+            self.CONFIG_DIR = config_dir
+            self.CONFIG_FILE = os.path.join(config_dir, "config.json")
+        self._listeners: List[Callable[[Dict[str, List[str]]], None]] = []
+        self.config = self._load_config()
+
+    def _load_config(self) -> Dict[str, List[str]]:
+        if not os.path.exists(self.CONFIG_DIR):
+            os.makedirs(self.CONFIG_DIR)
+        if not os.path.exists(self.CONFIG_FILE):
+            default_config = {
+                "blacklisted_files": [],
+                "blacklisted_directories": [],
+                "blacklisted_filetypes": [],
+                "duplicate_policy": "off",
+                "content_sniffing": False,
+                "rules": [],
+                "verify_copies": False,
+                "file_categories": {
+                    'Documents': ['txt', 'doc', 'docx', 'pdf', 'rtf', 'odt'],
+                    'Images': ['jpg', 'jpeg', 'png', 'gif', 'bmp'],
+                    'Audio': ['mp3', 'wav', 'ogg', 'flac'],
+                    'Videos': ['mp4', 'avi', 'mkv', 'mov'],
+                    'Python': ['py'],
+                    'JavaScript': ['js'],
+                    'HTML': ['html', 'htm']
+                }
+            }
+            self.save_config(default_config)
+            return default_config
+        with open(self.CONFIG_FILE, 'r') as f:
+            return json.load(f)
+
+    def save_config(self, config: Optional[Dict[str, List[str]]] = None) -> None:
+        config = config if config else self.config
+        with open(self.CONFIG_FILE, 'w') as f:
+            json.dump(config, f, indent=4)
+        for listener in self._listeners:
+            listener(config)
+
+    def subscribe(self, listener: Callable[[Dict[str, List[str]]], None]) -> None:
+        self._listeners.append(listener)
+
+
+def normalize_extension(extension: str) -> str:
+    return extension.strip().lstrip('.').lower()
+
+
+class DirectoryTrie:
+    # Path-component trie of directory rules: a lookup costs one dict access per
+    # path component, independent of how many directories are listed.
+    _TERMINAL = None
+
+    def __init__(self, directories: Iterable[str] = ()):
+        self._root: Dict[Optional[str], dict] = {}
+        for directory in directories:
+            self.add(directory)
+
+    def __bool__(self) -> bool:
+        return bool(self._root)
+
+    @staticmethod
+    def _components(path: str) -> List[str]:
+        return [part for part in os.path.normcase(os.path.abspath(path)).split(os.sep) if part]
+
+    def add(self, directory: str) -> None:
+        node = self._root
+        for part in self._components(directory):
+            node = node.setdefault(part, {})
+        node[self._TERMINAL] = {}
+
+    def contains(self, path: str) -> bool:
+        node = self._root
+        for part in self._components(path):
+            if self._TERMINAL in node:
+                return True
+            node = node.get(part)
+            if node is None:
+                return False
+        return self._TERMINAL in node
+
+
+class RuleIndex:
+    # Compiled, read-only view of the config used for per-file decisions, so
+    # classifying a file costs a couple of hash lookups instead of list scans.
+    def __init__(self, config: Dict[str, List[str]]):
+        extension_categories: Dict[str, str] = {}
+        for category, extensions in config.get("file_categories", {}).items():
+            for extension in extensions:
+                # The first category listing an extension wins, as before.
+                extension_categories.setdefault(normalize_extension(extension), category)
+        self.extension_categories = extension_categories
+        # Files whose extension maps to no category are classified by content.
+        self.content_sniffing = bool(config.get("content_sniffing"))
+        # Copies to another filesystem are read back and compared before the source is deleted.
+        self.verify_copies = bool(config.get("verify_copies"))
+        self.duplicate_policy = config.get("duplicate_policy")
+        if self.duplicate_policy not in DUPLICATE_POLICIES:
+            self.duplicate_policy = None
+        # Config rules (size, age, name patterns) are tried before the extension categories.
+        self.rules = RuleEngine(config.get("rules", []))
+        category_folders = set(extension_categories.values()) | {'Others'} | self.rules.top_folders
+        if self.duplicate_policy == 'move':
+            category_folders.add(DUPLICATES_FOLDER)
+        self.category_folders = frozenset(category_folders)
+        self.blacklisted_files = frozenset(config.get("blacklisted_files", []))
+        self.blacklisted_filetypes = frozenset(
+            normalize_extension(extension) for extension in config.get("blacklisted_filetypes", [])
+        )
+        self.blacklisted_directories = DirectoryTrie(config.get("blacklisted_directories", []))
+
+
+class Progress:
+    # Counters shared between a running operation and whoever observes it. The
+    # callback is throttled to one call per `interval` seconds, and cancel()
+    # makes the operation stop at the next file boundary.
+    def __init__(self, callback: Optional[Callable[['Progress'], None]] = None, interval: float = 0.1):
+        self.scanned = 0
+        self.moved = 0
+        self.bytes = 0
+        self.bytes_per_second = 0.0
+        self.total = 0
+        self.cancelled = False
+        self._callback = callback
+        self._interval = interval
+        self._last_report = 0.0
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def report(self, force: bool = False) -> None:
+        if self._callback is None:
+            return
+        now = time.monotonic()
+        if force or now - self._last_report >= self._interval:
+            self._last_report = now
+            self._callback(self)
+
+
+class OrganizationPlan:
+    # Paths are kept relative to `directory` and grouped by target folder to
+    # keep plans for large trees compact and cheap to serialize. `links` maps a
+    # duplicate source to the file whose content it shares; the duplicate is
+    # hardlinked to that file's final location instead of being moved.
+    def __init__(self, directory: str, moves: Optional[Dict[str, List[str]]] = None,
+                 links: Optional[Dict[str, str]] = None):
+        self.directory = directory
+        self.moves: Dict[str, List[str]] = moves if moves is not None else {}
+        self.links: Dict[str, str] = links if links is not None else {}
+
+    def __len__(self) -> int:
+        return sum(len(sources) for sources in self.moves.values())
+
+    def add(self, source: str, target_folder: str) -> None:
+        self.moves.setdefault(target_folder, []).append(source)
+
+    def iter_moves(self) -> Iterator[Tuple[str, str]]:
+        # The final names execute_plan would pick right now: a name that is
+        # taken in the target folder, or by an earlier source, gets " (1)" etc.
+        for target, sources in self.moves.items():
+            target_folder = os.path.join(self.directory, target)
+            try:
+                taken = set(os.listdir(target_folder))
+            except FileNotFoundError:
+                taken = set()
+            for source in sources:
+                name = unique_name(os.path.basename(source), taken)
+                taken.add(name)
+                yield os.path.join(self.directory, source), os.path.join(target_folder, name)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {"directory": self.directory, "moves": self.moves, "links": self.links}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object]) -> 'OrganizationPlan':
+        return cls(data["directory"], {target: list(sources) for target, sources in data["moves"].items()},
+                   dict(data.get("links", {})))
+
+    def save(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path: str) -> 'OrganizationPlan':
+        with open(path, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+
+class FileOrganizer(ABC):
+    def __init__(self, config: Dict[str, List[str]], duplicate_finder: Optional['DuplicateFinder'] = None,
+                 content_sniffer: Optional['ContentSniffer'] = None, state_dir: Optional[str] = None):
+        self._config = config
+        # The config dir holds the journals, caches and index; organizing a
+        # directory containing it must never move them.
+        self.state_dir = os.path.abspath(state_dir or ConfigManager.CONFIG_DIR)
+        self._rules = RuleIndex(config)
+        self.duplicate_finder = duplicate_finder
+        self.content_sniffer = content_sniffer
+        # Phase timings of the runs while set; see metrics.Metrics.
+        self.metrics: Optional[Metrics] = None
+
+    def rebuild_rules(self) -> None:
+        self._rules = RuleIndex(self._config)
+
+    @staticmethod
+    def get_file_extension(file_path: str) -> str:
+        return os.path.splitext(file_path)[1][1:].lower()
+
+    @staticmethod
+    def create_folder(directory: str, folder_name: str) -> str:
+        folder_path = os.path.join(directory, folder_name)
+        os.makedirs(folder_path, exist_ok=True)
+        return folder_path
+
+    @staticmethod
+    def move_file(file_path: str, new_path: str, verify: bool = False) -> Tuple[str, str]:
+        import transfer
+
+        transfer.move_file(file_path, new_path, verify)
+        return file_path, new_path
+
+    @property
+    def verify_copies(self) -> bool:
+        return self._rules.verify_copies
+
+    def is_blacklisted(self, file_path: str, filename: str) -> bool:
+        blacklisted_directories = self._rules.blacklisted_directories
+        return self.is_blacklisted_name(filename) or self.is_state_path(file_path) or (
+            bool(blacklisted_directories) and blacklisted_directories.contains(file_path)
+        )
+
+    def is_state_path(self, path: str) -> bool:
+        path = os.path.abspath(path)
+        return path == self.state_dir or path.startswith(os.path.join(self.state_dir, ''))
+
+    def is_pruned_directory(self, path: str) -> bool:
+        # Directories never descended into: the config dir and blacklisted ones.
+        # True for everything below them too, so it also filters the records of
+        # an index, which has no walk to prune.
+        blacklisted_directories = self._rules.blacklisted_directories
+        return self.is_state_path(path) or (bool(blacklisted_directories) and blacklisted_directories.contains(path))
+
+    def is_blacklisted_name(self, filename: str) -> bool:
+        rules = self._rules
+        if filename in rules.blacklisted_files:
+            return True
+        return bool(rules.blacklisted_filetypes) and self.get_file_extension(filename) in rules.blacklisted_filetypes
+
+    def scan(self, directory: str, with_stat: bool = False,
+             prune: Optional[Callable[[str], bool]] = None) -> Iterator[FileRecord]:
+        # Blacklisted directories and the config dir are pruned from the scan,
+        # so nothing below them is ever listed; records yielded here only need
+        # is_blacklisted_name.
+        if prune is None:
+            return scanner.scan(directory, prune=self.is_pruned_directory, with_stat=with_stat)
+
+        def is_pruned(path: str) -> bool:
+            return self.is_pruned_directory(path) or prune(path)
+
+        return scanner.scan(directory, prune=is_pruned, with_stat=with_stat)
+
+    def search(self, directory: str, query: SearchQuery, index: Optional['FileIndex'] = None,
+               progress: Optional[Progress] = None, with_stat: bool = False) -> Iterator[SearchResult]:
+        # Like scan, skips everything below blacklisted directories and the config dir.
+        return iter_search(directory, query, self.is_pruned_directory, index, progress, with_stat)
+
+    def category_folders(self) -> FrozenSet[str]:
+        return self._rules.category_folders
+
+    def get_destination_folder(self, file_extension: str) -> Tuple[str, Optional[str]]:
+        category_folder = self._rules.extension_categories.get(file_extension)
+        if category_folder is None:
+            return 'Others', None
+        return category_folder, file_extension.upper()
+
+    def get_extension_folder(self, file_extension: str) -> str:
+        category_folder, extension_folder = self.get_destination_folder(file_extension)
+        return os.path.join(category_folder, extension_folder) if extension_folder else category_folder
+
+    def get_rule_folder(self, record: FileRecord) -> Optional[str]:
+        rules = self._rules.rules
+        if not rules:
+            return None
+        return rules.match(record.name, record.ext, record.size, record.mtime)
+
+    def get_target_folder(self, record: FileRecord) -> str:
+        # Relative to the organized directory; records need size and mtime
+        # when the config has rules on them.
+        return self.get_rule_folder(record) or self.get_extension_folder(record.ext)
+
+    def plan_organization(self, directory: str, specific_type: Optional[str] = None,
+                          progress: Optional[Progress] = None) -> OrganizationPlan:
+        plan = OrganizationPlan(directory)
+        prefix_length = len(directory)
+        sniffing = self._rules.content_sniffing
+        extension_categories = self._rules.extension_categories
+        unknown: List[Tuple[str, FileRecord]] = []
+        prune = None
+        if self._rules.duplicate_policy == 'move':
+            duplicates_folder = os.path.join(directory, DUPLICATES_FOLDER)
+            prune = duplicates_folder.__eq__
+        rules = self._rules.rules
+        rules.set_now(time.time())
+        metrics = self.metrics
+
+        records = self.scan(directory, with_stat=rules.needs_stat, prune=prune)
+        if metrics is not None:
+            records = metrics.iterate('scan', records)
+        for record in records:
+            if progress is not None:
+                if progress.cancelled:
+                    break
+                progress.scanned += 1
+                progress.report()
+            if self.is_blacklisted_name(record.name):
+                continue
+            if specific_type and record.ext != specific_type:
+                continue
+            relative_path = record.path[prefix_length:].lstrip(os.sep)
+            if metrics is not None:
+                start = time.perf_counter()
+            target_folder = self.get_rule_folder(record)
+            if target_folder is None and not (sniffing and record.ext not in extension_categories):
+                target_folder = self.get_extension_folder(record.ext)
+            if metrics is not None:
+                metrics.add('classify', time.perf_counter() - start)
+            if target_folder is None:
+                unknown.append((relative_path, record))
+                continue
+            self._add_to_plan(plan, relative_path, target_folder)
+
+        if not (progress is not None and progress.cancelled):
+            self._add_sniffed_to_plan(plan, unknown)
+            self.resolve_duplicates(plan)
+        return plan
+
+    def plan_files(self, directory: str, file_paths: Iterable[str]) -> OrganizationPlan:
+        plan = OrganizationPlan(directory)
+        sniffing = self._rules.content_sniffing
+        unknown: List[Tuple[str, FileRecord]] = []
+        rules = self._rules.rules
+        rules.set_now(time.time())
+        for file_path in file_paths:
+            filename = os.path.basename(file_path)
+            if self.is_blacklisted(file_path, filename):
+                continue
+            record = FileRecord(file_path, filename, self.get_file_extension(filename))
+            if rules.needs_stat:
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                record = record._replace(size=stat.st_size, mtime=stat.st_mtime)
+            relative_path = os.path.relpath(file_path, directory)
+            target_folder = self.get_rule_folder(record)
+            if target_folder is None:
+                if sniffing and record.ext not in self._rules.extension_categories:
+                    unknown.append((relative_path, record))
+                    continue
+                target_folder = self.get_extension_folder(record.ext)
+            self._add_to_plan(plan, relative_path, target_folder)
+        self._add_sniffed_to_plan(plan, unknown)
+        self.resolve_duplicates(plan)
+        return plan
+
+    def _add_sniffed_to_plan(self, plan: OrganizationPlan, unknown: List[Tuple[str, FileRecord]]) -> None:
+        # Files that would land in Others are classified by their first bytes,
+        # all at once so the header reads overlap on the sniffer's thread pool.
+        if not unknown:
+            return
+        if self.content_sniffer is None:
+            from sniff import ContentSniffer, SniffCache
+            self.content_sniffer = ContentSniffer(SniffCache(os.path.join(self.state_dir, "sniff_cache.sqlite3")))
+        with timed(self.metrics, 'sniff', len(unknown)):
+            sniffed = self.content_sniffer.sniff_many([record.path for _, record in unknown])
+        for relative_path, record in unknown:
+            file_extension = sniffed.get(record.path, record.ext)
+            self._add_to_plan(plan, relative_path, self.get_extension_folder(file_extension))
+
+    def resolve_duplicates(self, plan: OrganizationPlan) -> None:
+        # Applies the configured duplicate policy to a plan. Files already in
+        # the target folders are listed first so that they are the copies kept.
+        policy = self._rules.duplicate_policy
+        if policy is None or not plan.moves:
+            return
+        if self.duplicate_finder is None:
+            from dedupe import DuplicateFinder, HashCache
+            self.duplicate_finder = DuplicateFinder(HashCache(os.path.join(self.state_dir, "hash_cache.sqlite3")))
+
+        directory = plan.directory
+        candidates = []
+        for target in plan.moves:
+            target_folder = os.path.join(directory, target)
+            if os.path.isdir(target_folder):
+                candidates.extend(
+                    entry.path for entry in scanner.list_directory(target_folder) if not entry.is_dir
+                )
+        candidates.extend(os.path.join(directory, source) for sources in plan.moves.values() for source in sources)
+        with timed(self.metrics, 'dedupe', len(candidates)):
+            duplicates = self.duplicate_finder.find(candidates)
+        if not duplicates:
+            return
+
+        moves: Dict[str, List[str]] = {}
+        for target, sources in plan.moves.items():
+            for source in sources:
+                keeper = duplicates.get(os.path.join(directory, source))
+                if keeper is None:
+                    moves.setdefault(target, []).append(source)
+                elif policy == 'move':
+                    moves.setdefault(DUPLICATES_FOLDER, []).append(source)
+                elif policy == 'hardlink':
+                    moves.setdefault(target, []).append(source)
+                    plan.links[source] = os.path.relpath(keeper, directory)
+        plan.moves = moves
+
+    @staticmethod
+    def _add_to_plan(plan: OrganizationPlan, relative_path: str, target_folder: str) -> None:
+        if os.path.dirname(relative_path) != target_folder:
+            plan.add(relative_path, target_folder)
+
+    @abstractmethod
+    async def organize_files(self, directory: str, specific_type: Optional[str] = None,
+                             progress: Optional[Progress] = None,
+                             journal: Optional['MoveJournal'] = None) -> List[Tuple[str, str]]:
+        pass
+
+
+class SyncFileOrganizer(FileOrganizer):
+    async def organize_files(self, directory: str, specific_type: Optional[str] = None,
+                             progress: Optional[Progress] = None,
+                             journal: Optional['MoveJournal'] = None) -> List[Tuple[str, str]]:
+        plan = self.plan_organization(directory, specific_type, progress)
+        if progress is not None and progress.cancelled:
+            return []
+        return execute_plan(plan, progress, journal, self.verify_copies, self.metrics)
+
+
+class ParallelFileOrganizer(FileOrganizer):
+    def __init__(self, config: Dict[str, List[str]], max_workers: Optional[int] = None,
+                 use_processes: bool = False, batch_size: int = 64, max_pending: Optional[int] = None,
+                 state_dir: Optional[str] = None):
+        super().__init__(config, state_dir=state_dir)
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.use_processes = use_processes
+        self.batch_size = batch_size
+        # Bounds the number of queued batches so scanning a huge tree does not
+        # buffer millions of moves ahead of the workers.
+        self.max_pending = max_pending or self.max_workers * 4
+
+    @classmethod
+    def move_batch(cls, batch: List[Tuple[str, str]],
+                   verify: bool = False) -> Tuple[List[Tuple[str, str]], Optional[Exception]]:
+        # Stops at the first failure and returns it along with the moves done
+        # before it, so those still reach the journal.
+        moved = []
+        for file_path, new_path in batch:
+            try:
+                moved.append(cls.move_file(file_path, new_path, verify))
+            except Exception as e:
+                return moved, e
+        return moved, None
+
+    @classmethod
+    def timed_move_batch(cls, batch: List[Tuple[str, str]],
+                         verify: bool = False) -> Tuple[List[Tuple[str, str]], Optional[Exception], float]:
+        # Timed in the worker, which may be another process, so queueing is not counted.
+        start = time.perf_counter()
+        moved, error = cls.move_batch(batch, verify)
+        return moved, error, time.perf_counter() - start
+
+    def _create_executor(self) -> 'Executor':
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+        if self.use_processes:
+            return ProcessPoolExecutor(max_workers=self.max_workers)
+        return ThreadPoolExecutor(max_workers=self.max_workers)
+
+    async def organize_files(self, directory: str, specific_type: Optional[str] = None,
+                             progress: Optional[Progress] = None,
+                             journal: Optional['MoveJournal'] = None) -> List[Tuple[str, str]]:
+        if self._rules.duplicate_policy is not None or self._rules.content_sniffing:
+            # Deduplication and sniffing work on every candidate before the first move.
+            plan = self.plan_organization(directory, specific_type, progress)
+            if progress is not None and progress.cancelled:
+                return []
+            return execute_plan(plan, progress, journal, self.verify_copies, self.metrics)
+
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        folders: Dict[str, str] = {}
+        taken: Dict[str, Set[str]] = {}
+        destinations: Set[str] = set()
+        batches: List[asyncio.Future] = []
+        pending: Set[asyncio.Future] = set()
+        batch: List[Tuple[str, str]] = []
+
+        rules = self._rules.rules
+        rules.set_now(time.time())
+        metrics = self.metrics
+
+        with self._create_executor() as executor:
+            records = self.scan(directory, with_stat=rules.needs_stat)
+            if metrics is not None:
+                records = metrics.iterate('scan', records)
+            for record in records:
+                if progress is not None:
+                    if progress.cancelled:
+                        break
+                    progress.scanned += 1
+                    progress.report()
+                # The scan can reach category folders filled earlier in this run.
+                if record.path in destinations or self.is_blacklisted_name(record.name):
+                    continue
+                if specific_type and record.ext != specific_type:
+                    continue
+
+                if metrics is not None:
+                    start = time.perf_counter()
+                    target = self.get_target_folder(record)
+                    metrics.add('classify', time.perf_counter() - start)
+                else:
+                    target = self.get_target_folder(record)
+                target_folder = folders.get(target)
+                if target_folder is None:
+                    with timed(metrics, 'mkdir'):
+                        target_folder = folders[target] = self.create_folder(directory, target)
+                        taken[target_folder] = set(os.listdir(target_folder))
+
+                if os.path.dirname(record.path) == target_folder:
+                    continue
+                names = taken[target_folder]
+                name = unique_name(record.name, names)
+                names.add(name)
+                new_path = os.path.join(target_folder, name)
+                destinations.add(new_path)
+                batch.append((record.path, new_path))
+                if len(batch) < self.batch_size:
+                    continue
+
+                pending.add(self._submit(loop, executor, batch, batches, progress, journal))
+                batch = []
+                if len(pending) >= self.max_pending:
+                    _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+            if batch and not (progress is not None and progress.cancelled):
+                self._submit(loop, executor, batch, batches, progress, journal)
+            results = await asyncio.gather(*batches)
+        if journal is not None:
+            journal.sync()
+        # Every completed move is journaled before the first failure is raised.
+        error = next((error for _, error in results if error is not None), None)
+        if error is not None:
+            raise error
+        return [move for batch_moves, _ in results for move in batch_moves]
+
+    def _submit(self, loop: 'asyncio.AbstractEventLoop', executor: 'Executor',
+                batch: List[Tuple[str, str]], batches: List['asyncio.Future'],
+                progress: Optional[Progress] = None, journal: Optional['MoveJournal'] = None) -> 'asyncio.Future':
+        if self.metrics is None:
+            future = loop.run_in_executor(executor, self.move_batch, batch, self.verify_copies)
+        else:
+            future = loop.create_task(self._timed_batch(
+                loop.run_in_executor(executor, self.timed_move_batch, batch, self.verify_copies), self.metrics))
+        batches.append(future)
+        if progress is not None:
+            progress.total += len(batch)
+        if progress is not None or journal is not None:
+            future.add_done_callback(lambda done: self._batch_done(done, progress, journal))
+        return future
+
+    @staticmethod
+    async def _timed_batch(future: 'asyncio.Future',
+                           metrics: Metrics) -> Tuple[List[Tuple[str, str]], Optional[Exception]]:
+        moved, error, seconds = await future
+        metrics.add('move', seconds, len(moved))
+        return moved, error
+
+    @staticmethod
+    def _batch_done(future: 'asyncio.Future', progress: Optional[Progress], journal: Optional['MoveJournal']) -> None:
+        if future.cancelled() or future.exception() is not None:
+            return
+        moved, _ = future.result()
+        if journal is not None:
+            journal.record_many(moved)
+        if progress is not None:
+            progress.moved += len(moved)
+            progress.report()
+
+
+def unique_name(name: str, taken: Set[str]) -> str:
+    # "report.pdf" -> "report (1).pdf" while the name is taken in the folder.
+    if name not in taken:
+        return name
+    stem, extension = os.path.splitext(name)
+    counter = 1
+    while f"{stem} ({counter}){extension}" in taken:
+        counter += 1
+    return f"{stem} ({counter}){extension}"
+
+
+def link_file(source_path: str, new_path: str) -> bool:
+    # Replaces `new_path` with a hardlink to `source_path`. Fails softly where
+    # hardlinks are not possible (other filesystems, FAT, some network shares).
+    # The link is made under a fresh name next to `new_path` and renamed over
+    # it; only a name this function created is ever removed.
+    directory, name = os.path.split(new_path)
+    while True:
+        temporary_path = os.path.join(directory, f".{name}.{os.urandom(4).hex()}.link")
+        try:
+            os.link(source_path, temporary_path)
+        except FileExistsError:
+            continue
+        except OSError:
+            return False
+        break
+    try:
+        os.replace(temporary_path, new_path)
+    except OSError:
+        os.unlink(temporary_path)
+        return False
+    return True
+
+
+def execute_plan(plan: OrganizationPlan, progress: Optional[Progress] = None,
+                 journal: Optional['MoveJournal'] = None, verify: bool = False,
+                 metrics: Optional[Metrics] = None) -> List[Tuple[str, str]]:
+    # Same-filesystem moves are renames done in order. Moves to another
+    # filesystem are detected up front from st_dev and handed to a
+    # TransferPool, so copying overlaps with the renames and with each other.
+    target_folders = {target: os.path.join(plan.directory, target) for target in plan.moves}
+    # Folders made here that may end up empty because their sources vanished.
+    created: Set[str] = set()
+    vanished: Set[str] = set()
+    for folder in target_folders.values():
+        with timed(metrics, 'mkdir'):
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+                created.add(folder)
+
+    organized_files: List[Tuple[str, str]] = []
+    source_devices: Dict[str, int] = {}
+    pool: Optional['TransferPool'] = None
+    # Final locations of files that duplicates are hardlinked to.
+    keepers: Dict[str, str] = dict.fromkeys(plan.links.values(), "")
+    if progress is not None:
+        progress.total = len(plan)
+    try:
+        for target, sources in plan.moves.items():
+            target_folder = target_folders[target]
+            target_device = os.stat(target_folder).st_dev
+            # One listing per folder so that a move never replaces an existing file.
+            taken = set(os.listdir(target_folder))
+            for source in sources:
+                if progress is not None:
+                    if progress.cancelled:
+                        break
+                    progress.moved += 1
+                    progress.report()
+                file_path = os.path.join(plan.directory, source)
+                name = unique_name(os.path.basename(source), taken)
+                taken.add(name)
+                new_path = os.path.join(target_folder, name)
+                source_folder = os.path.dirname(file_path)
+                try:
+                    source_device = source_devices.get(source_folder)
+                    if source_device is None:
+                        source_device = source_devices[source_folder] = os.stat(source_folder).st_dev
+                    if source_device != target_device:
+                        if pool is None:
+                            from transfer import TransferPool
+                            pool = TransferPool(verify=verify,
+                                                cancelled=lambda: progress is not None and progress.cancelled,
+                                                metrics=metrics)
+                        if source in keepers:
+                            keepers[source] = new_path
+                        pool.submit(file_path, new_path)
+                        continue
+                    if metrics is not None:
+                        start = time.perf_counter()
+                        os.replace(file_path, new_path)
+                        metrics.add('move', time.perf_counter() - start)
+                    else:
+                        os.replace(file_path, new_path)
+                except FileNotFoundError:
+                    # Deleted or renamed since it was planned; the rest still moves.
+                    if os.path.lexists(file_path):
+                        raise
+                    taken.discard(name)
+                    vanished.add(target_folder)
+                    continue
+                if source in keepers:
+                    keepers[source] = new_path
+                organized_files.append((file_path, new_path))
+                if journal is not None:
+                    journal.record(file_path, new_path)
+            if progress is not None and progress.cancelled:
+                break
+    finally:
+        if pool is not None:
+            _finish_transfers(pool, organized_files, progress, journal)
+    if journal is not None:
+        journal.sync()
+    if vanished & created:
+        delete_empty_folders(plan.directory, vanished & created)
+    if progress is not None and progress.cancelled:
+        return organized_files
+
+    # Moved duplicates become hardlinks once every kept file is in place. The
+    # journal entry stays valid: restoring moves the link back.
+    moved = dict(organized_files) if plan.links else {}
+    for source, keeper in plan.links.items():
+        new_path = moved.get(os.path.join(plan.directory, source))
+        if new_path is not None:
+            link_file(keepers[keeper] or os.path.join(plan.directory, keeper), new_path)
+    return organized_files
+
+
+def _finish_transfers(pool: 'TransferPool', organized_files: List[Tuple[str, str]],
+                      progress: Optional[Progress], journal: Optional['MoveJournal']) -> None:
+    # Waits for the copies, journaling each one as it completes. A failed copy
+    # leaves its source in place; the first error is raised once the others
+    # have finished, so nothing that did move is missing from the journal.
+    from concurrent.futures import FIRST_COMPLETED, wait
+    from transfer import TransferCancelled
+
+    error: Optional[Exception] = None
+    pending = set(pool.futures)
+    while pending:
+        done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                move = future.result()
+            except TransferCancelled:
+                continue
+            except Exception as e:
+                error = error or e
+                continue
+            if move is None:
+                continue
+            organized_files.append(move)
+            if journal is not None:
+                journal.record(*move)
+        if progress is not None:
+            progress.bytes = pool.bytes
+            progress.bytes_per_second = pool.bytes_per_second
+            progress.report()
+    pool.shutdown()
+    if progress is not None:
+        progress.bytes_per_second = pool.bytes_per_second
+    if pool.metrics is not None:
+        pool.metrics.count('bytes_copied', pool.bytes)
+    if error is not None:
+        raise error
+
+
+def delete_empty_folders(path: str, touched: Optional[Iterable[str]] = None) -> int:
+    # Bottom-up and iterative: each candidate costs one rmdir, which fails on
+    # non-empty folders. Without `touched` every folder below `path` is a
+    # candidate; with it only those folders and, once removed, their parents
+    # are, so the work follows what a restore actually emptied. `path` itself
+    # is never removed.
+    root = os.path.abspath(path)
+    removed = 0
+    if touched is None:
+        folders: List[str] = []
+        for _ in scanner.scan(root, on_directory=folders.append):
+            pass
+        # The scan reports parents before their children.
+        for folder in reversed(folders):
+            try:
+                os.rmdir(folder)
+            except OSError:
+                continue
+            removed += 1
+        return removed
+
+    prefix = os.path.join(root, '')
+    seen = {os.path.abspath(folder) for folder in touched}
+    pending = [(-folder.count(os.sep), folder) for folder in seen if folder.startswith(prefix)]
+    heapq.heapify(pending)
+    while pending:
+        _, folder = heapq.heappop(pending)
+        try:
+            os.rmdir(folder)
+        except OSError:
+            continue
+        removed += 1
+        parent = os.path.dirname(folder)
+        if parent.startswith(prefix) and parent not in seen:
+            seen.add(parent)
+            heapq.heappush(pending, (-parent.count(os.sep), parent))
+    return removed
+
+
+def restore_file(original_path: str, new_path: str) -> bool:
+    try:
+        os.replace(new_path, original_path)
+    except FileNotFoundError:
+        if not os.path.exists(new_path):
+            # Already restored, or removed by the user since it was organized.
+            return False
+        os.makedirs(os.path.dirname(original_path), exist_ok=True)
+        shutil.move(new_path, original_path)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        import transfer
+
+        transfer.move_file(new_path, original_path)
+    return True
+
+
+async def restore_files(journal: 'MoveJournal', current_directory: str, progress: Optional[Progress] = None,
+                        batch_size: int = 1024, max_workers: int = 8, metrics: Optional[Metrics] = None) -> int:
+    # Streams the journal newest-first in batches, restoring each batch on a
+    # thread pool and truncating the journal behind it, so an interrupted
+    # restore picks up where it stopped. A file moved more than once in the
+    # journal is never restored twice within the same batch.
+    from concurrent.futures import ThreadPoolExecutor
+
+    restored = 0
+    touched: Set[str] = set()
+    journal.close()
+
+    def restore(move: Tuple[str, str]) -> bool:
+        if metrics is None:
+            return restore_file(*move)
+        start = time.perf_counter()
+        result = restore_file(*move)
+        metrics.add('restore', time.perf_counter() - start)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        batch: List[Tuple[str, str]] = []
+        batch_paths: Set[str] = set()
+        batch_offset = 0
+
+        def flush() -> None:
+            nonlocal restored
+            restored += sum(executor.map(restore, batch))
+            journal.truncate(batch_offset)
+            batch.clear()
+            batch_paths.clear()
+            if progress is not None:
+                progress.moved = restored
+                progress.report()
+
+        for offset, original_path, new_path in journal.iter_reverse():
+            if progress is not None and progress.cancelled:
+                break
+            if len(batch) >= batch_size or original_path in batch_paths or new_path in batch_paths:
+                flush()
+                if progress is not None and progress.cancelled:
+                    break
+            batch.append((original_path, new_path))
+            batch_paths.update((original_path, new_path))
+            touched.add(os.path.dirname(new_path))
+            batch_offset = offset
+        else:
+            if batch:
+                flush()
+
+    with timed(metrics, 'cleanup'):
+        removed = delete_empty_folders(current_directory, touched)
+    if metrics is not None:
+        metrics.count('files_restored', restored)
+        metrics.count('folders_removed', removed)
+    return restored
+
+
+class BlacklistHandler:
+    def __init__(self, config: Dict[str, List[str]], config_manager: ConfigManager):
+        self._config = config
+        self.config_manager = config_manager
+
+    def handle_blacklist(self, action: str, items: str) -> List[Tuple[bool, str]]:
+        messages = []
+        items_list = [item.strip() for item in items.split(",")]
+        for item in items_list:
+            item_type = (
+                'filetypes' if item.startswith('.') else
+                'directories' if os.path.isdir(item) else 'files'
+            )
+            blacklist_key = f'blacklisted_{item_type}'
+
+            if action == 'add':
+                if item not in self._config[blacklist_key]:
+                    self._config[blacklist_key].append(item)
+                    messages.append((True, f"Added '{item}' to blacklisted {item_type}."))
+                else:
+                    messages.append((False, f"'{item}' is already in blacklisted {item_type}."))
+            elif action == 'remove':
+                if item in self._config[blacklist_key]:
+                    self._config[blacklist_key].remove(item)
+                    messages.append((True, f"Removed '{item}' from blacklisted {item_type}."))
+                else:
+                    messages.append((False, f"'{item}' not found in blacklisted {item_type}."))
+        self.config_manager.save_config()
+        return messages
+
+    def describe_blacklist(self) -> str:
+        blacklist_message = ""
+        for key in ['blacklisted_files', 'blacklisted_directories', 'blacklisted_filetypes']:
+            if self._config[key]:
+                blacklist_message += f"Blacklisted {key.split('_')[1].capitalize()}: " + ", ".join(self._config[key]) + "\n"
+        if not blacklist_message:
+            blacklist_message = "All blacklists are empty."
+        return blacklist_message
+
+    def reset_to_default(self) -> None:
+        self._config = ConfigManager(self.config_manager.CONFIG_DIR).config
+        self.config_manager.save_config(self._config)
+
+
+def get_directory_stats(directory: str, index: Optional['FileIndex'] = None,
+                        progress: Optional[Progress] = None) -> Tuple[int, int, int]:
+    if index is not None:
+        index.refresh(directory, progress)
+        return index.stats(directory)
+
+    total_files, total_dirs, total_size = 0, 0, 0
+
+    def count_directory(_: str) -> None:
+        nonlocal total_dirs
+        total_dirs += 1
+
+    for record in scanner.scan(directory, with_stat=True, on_directory=count_directory):
+        total_files += 1
+        total_size += record.size or 0
+        if progress is not None:
+            if progress.cancelled:
+                break
+            progress.scanned = total_files
+            progress.bytes = total_size
+            progress.report()
+    return total_files, total_dirs, total_size
+
+
+def search_files(directory: str, query: str, index: Optional['FileIndex'] = None,
+                 progress: Optional[Progress] = None) -> List[str]:
+    return [result.path for result in iter_search(directory, SearchQuery(query), index=index, progress=progress)]
@@ -0,0 +1,125 @@
+import mmap
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from typing import List, Optional
+
+SNIFF_SIZE = 8192
+CHUNK_SIZE = 256 * 1024
+MAX_LINE_LENGTH = 4096
+HEX_ROW = 16
+
+# Bytes that occur in text files; anything else in the first block means binary.
+_TEXT_BYTES = bytes({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7f})
+
+
+def is_binary(block: bytes) -> bool:
+    if not block:
+        return False
+    if b"\0" in block:
+        return True
+    return len(block.translate(None, _TEXT_BYTES)) / len(block) > 0.3
+
+
+class FilePreview:
+    # Memory-maps a file and decodes only the requested window, so opening a
+    # multi-GB file costs the same as opening a small one. Text files get a
+    # sparse line index built on a background thread: one checkpoint per
+    # CHUNK_SIZE bytes holding the number of newlines before it, so seeking to
+    # a line scans at most one chunk.
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size
+        self._map: Optional[mmap.mmap] = None
+        if self.size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.binary = is_binary(self._read(0, SNIFF_SIZE))
+        self._chunk_lines = array('Q', [0])
+        self._lines = 1 if self.size else 0
+        self.indexed = self.binary or not self.size
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _read(self, start: int, end: int) -> bytes:
+        return self._map[start:end] if self._map is not None else b""
+
+    def start_indexing(self) -> None:
+        if not self.indexed and self._thread is None:
+            self._thread = threading.Thread(target=self._index_lines, daemon=True)
+            self._thread.start()
+
+    def _index_lines(self) -> None:
+        lines = 0
+        for start in range(0, self.size, CHUNK_SIZE):
+            if self._stop.is_set():
+                return
+            lines += self._read(start, start + CHUNK_SIZE).count(b"\n")
+            self._chunk_lines.append(lines)
+            self._lines = lines + 1
+        # A trailing newline does not start another line.
+        if self._read(self.size - 1, self.size) == b"\n":
+            self._lines = lines
+        self.indexed = True
+
+    @property
+    def line_count(self) -> int:
+        # Lines indexed so far; final once `indexed` is set.
+        return self._lines
+
+    @property
+    def row_count(self) -> int:
+        return (self.size + HEX_ROW - 1) // HEX_ROW
+
+    def _line_offset(self, line: int) -> Optional[int]:
+        # The last chunk that starts before `line` begins; the line starts
+        # after the remaining newlines in or after that chunk.
+        chunk = bisect_left(self._chunk_lines, line) - 1
+        if chunk < 0:
+            return 0
+        offset = chunk * CHUNK_SIZE
+        for _ in range(line - self._chunk_lines[chunk]):
+            offset = self._map.find(b"\n", offset) + 1
+            if not offset:
+                return None
+        return offset
+
+    def lines(self, first: int, count: int) -> List[str]:
+        if self._map is None:
+            return []
+        offset = self._line_offset(first)
+        if offset is None:
+            return []
+        lines = []
+        while len(lines) < count and offset < self.size:
+            end = self._map.find(b"\n", offset, offset + MAX_LINE_LENGTH)
+            if end >= 0:
+                lines.append(self._read(offset, end).rstrip(b"\r").decode('utf-8', 'replace'))
+                offset = end + 1
+                continue
+            # Over-long line: show its start and skip the rest.
+            end = min(offset + MAX_LINE_LENGTH, self.size)
+            next_line = self._map.find(b"\n", end)
+            line = self._read(offset, end).decode('utf-8', 'replace')
+            lines.append(line + "…" if next_line != end and end < self.size else line)
+            offset = self.size if next_line < 0 else next_line + 1
+        return lines
+
+    def hex_rows(self, first: int, count: int) -> List[str]:
+        start = first * HEX_ROW
+        data = self._read(start, start + count * HEX_ROW)
+        rows = []
+        for row in range(0, len(data), HEX_ROW):
+            chunk = data[row:row + HEX_ROW]
+            text = "".join(chr(byte) if 0x20 <= byte < 0x7f else "." for byte in chunk)
+            rows.append(f"{start + row:010x}  {chunk.hex(' '):<{HEX_ROW * 3 - 1}}  {text}")
+        return rows
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
@@ -0,0 +1,222 @@
+import fnmatch
+import os
+import re
+import time
+from typing import Dict, List, Optional, Pattern
+
+_SIZE_UNITS = {"": 1, "b": 1, "kb": 1024, "mb": 1024 ** 2, "gb": 1024 ** 3, "tb": 1024 ** 4}
+_SIZE_PATTERN = re.compile(r"\s*(\d+(?:\.\d+)?)\s*([a-z]*)\s*$", re.IGNORECASE)
+_CONDITIONS = {
+    "folder", "extensions", "glob", "regex", "larger_than", "smaller_than", "older_than_days", "newer_than_days"
+}
+_DAY = 86400
+# Backreferences and named groups, which stop a pattern from being combined.
+_GROUP_REFERENCE = re.compile(r"\\[1-9]|\(\?P[<=]|\(\?\(")
+
+
+def parse_size(value) -> int:
+    # 1073741824, "1GB", "1.5 gb" and "500 MB" are all accepted.
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = _SIZE_PATTERN.match(str(value))
+    if match is None or match.group(2).lower() not in _SIZE_UNITS:
+        raise ValueError(f"invalid size {value!r}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).lower()])
+
+
+def is_anchored(regex: str) -> bool:
+    # True when a match can only start at the beginning of the name: a leading
+    # "^" and no "|" outside of groups, so re.match finds what re.search would.
+    if not regex.startswith("^"):
+        return False
+    depth = 0
+    position = 1
+    while position < len(regex):
+        char = regex[position]
+        if char == "\\":
+            position += 1
+        elif char == "[":
+            # A "]" first in a class (after an optional "^") is a literal.
+            position += 2 if regex.startswith("^", position + 1) else 1
+            if regex.startswith("]", position):
+                position += 1
+            while position < len(regex) and regex[position] != "]":
+                position += 2 if regex[position] == "\\" else 1
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return False
+        position += 1
+    return True
+
+
+def normalize_folder(folder: str) -> str:
+    # Placeholders that render empty leave empty components behind, and
+    # "ByExt/" has to name the same folder as "ByExt": otherwise a file already
+    # in place looks misplaced and every rerun renames it again.
+    return os.sep.join(part for part in folder.split(os.sep) if part not in ("", "."))
+
+
+class Rule:
+    # One entry of the config's "rules" list. A rule matches when all of its
+    # conditions hold; `folder` may use {year}, {month} and {day} of the file's
+    # mtime and {ext}/{EXT} of its extension.
+    __slots__ = ('index', 'folder', 'extensions', 'pattern', 'larger_than', 'smaller_than', 'older_than',
+                 'newer_than', 'older_than_cutoff', 'newer_than_cutoff', 'needs_stat', 'dated', 'templated',
+                 'searched')
+
+    def __init__(self, index: int, rule: Dict[str, object]):
+        unknown = set(rule) - _CONDITIONS
+        if unknown:
+            raise ValueError(f"rule {index}: unknown keys {', '.join(sorted(unknown))}")
+        folder = str(rule.get("folder", "")).strip("/\\")
+        if not folder or os.path.isabs(folder) or ".." in re.split(r"[/\\]", folder):
+            raise ValueError(f"rule {index}: 'folder' must be a relative folder name")
+        self.index = index
+        self.folder = normalize_folder(folder.replace("/", os.sep))
+        extensions = rule.get("extensions")
+        self.extensions = frozenset(ext.strip().lstrip('.').lower() for ext in extensions) if extensions else None
+        self.pattern: Optional[Pattern[str]] = None
+        # Globs match the whole name, regexes are searched anywhere in it
+        # unless they can only match at its start anyway.
+        self.searched = "glob" not in rule and "regex" in rule and not is_anchored(rule["regex"])
+        try:
+            if "glob" in rule:
+                self.pattern = re.compile(fnmatch.translate(rule["glob"]), re.IGNORECASE)
+            elif "regex" in rule:
+                self.pattern = re.compile(rule["regex"])
+        except re.error as e:
+            raise ValueError(f"rule {index}: {e}") from e
+        self.larger_than = parse_size(rule["larger_than"]) if "larger_than" in rule else None
+        self.smaller_than = parse_size(rule["smaller_than"]) if "smaller_than" in rule else None
+        self.older_than = float(rule["older_than_days"]) * _DAY if "older_than_days" in rule else None
+        self.newer_than = float(rule["newer_than_days"]) * _DAY if "newer_than_days" in rule else None
+        self.older_than_cutoff = self.newer_than_cutoff = 0.0
+        self.templated = "{" in self.folder
+        self.dated = any(field in self.folder for field in ("{year}", "{month}", "{day}"))
+        self.needs_stat = self.dated or any(
+            value is not None for value in (self.larger_than, self.smaller_than, self.older_than, self.newer_than)
+        )
+        try:
+            bare = self.folder.format(year=0, month=0, day=0, ext="", EXT="")
+        except (KeyError, IndexError, ValueError) as e:
+            raise ValueError(f"rule {index}: invalid folder template {folder!r}") from e
+        # A file without an extension would otherwise be "organized" into the root.
+        if not normalize_folder(bare) and (self.extensions is None or "" in self.extensions):
+            raise ValueError(f"rule {index}: folder template {folder!r} is empty for files without an extension")
+
+    def set_now(self, now: float) -> None:
+        if self.older_than is not None:
+            self.older_than_cutoff = now - self.older_than
+        if self.newer_than is not None:
+            self.newer_than_cutoff = now - self.newer_than
+
+    def matches(self, name: str, size: Optional[int], mtime: Optional[float]) -> bool:
+        if self.pattern is not None:
+            found = self.pattern.search(name) if self.searched else self.pattern.match(name)
+            if found is None:
+                return False
+        if not self.needs_stat:
+            return True
+        if size is None or mtime is None:
+            return False
+        if self.larger_than is not None and size <= self.larger_than:
+            return False
+        if self.smaller_than is not None and size >= self.smaller_than:
+            return False
+        if self.older_than is not None and mtime >= self.older_than_cutoff:
+            return False
+        if self.newer_than is not None and mtime < self.newer_than_cutoff:
+            return False
+        return True
+
+    def target_folder(self, ext: str, mtime: Optional[float]) -> str:
+        if not self.templated:
+            return self.folder
+        if self.dated:
+            date = time.localtime(mtime)
+            return normalize_folder(self.folder.format(year=date.tm_year, month=f"{date.tm_mon:02d}",
+                                                       day=f"{date.tm_mday:02d}", ext=ext, EXT=ext.upper()))
+        return normalize_folder(self.folder.format(year="", month="", day="", ext=ext, EXT=ext.upper()))
+
+
+class RuleEngine:
+    # Rules are tried in config order and the first match wins. Instead of
+    # testing every rule against every file, each file only sees:
+    #   - rules listing its extension, found with one dict lookup;
+    #   - rules with a name pattern but no extensions, and only when a single
+    #     combined regex over all those patterns matches the name;
+    #   - rules with neither, which only compare stat data against thresholds.
+    def __init__(self, rules: List[Dict[str, object]]):
+        self.rules = [Rule(index, rule) for index, rule in enumerate(rules)]
+        self.needs_stat = any(rule.needs_stat for rule in self.rules)
+        self.top_folders = frozenset(
+            top_folder for top_folder in (rule.folder.split(os.sep, 1)[0] for rule in self.rules)
+            if "{" not in top_folder
+        )
+
+        generic = [rule for rule in self.rules if rule.extensions is None and rule.pattern is None]
+        named = [rule for rule in self.rules if rule.extensions is None and rule.pattern is not None]
+        self._names: Optional[Pattern[str]] = None
+        self._named_from: Dict[str, List[Rule]] = {}
+        alternatives = []
+        combined: List[Rule] = []
+        for rule in named:
+            pattern = rule.pattern.pattern
+            if rule.searched:
+                pattern = f"(?s:.*?)(?:{pattern})"
+            if rule.pattern.flags & re.IGNORECASE:
+                pattern = f"(?i:{pattern})"
+            # Inside the alternation groups are renumbered and group names may
+            # clash, and some patterns (e.g. inline global flags) do not embed.
+            # Those are tested one by one instead, like the generic rules.
+            if _GROUP_REFERENCE.search(pattern):
+                generic.append(rule)
+                continue
+            try:
+                re.compile(pattern)
+            except re.error:
+                generic.append(rule)
+                continue
+            alternatives.append(f"(?P<r{rule.index}>{pattern})")
+            combined.append(rule)
+        generic.sort(key=lambda rule: rule.index)
+        if alternatives:
+            self._names = re.compile("|".join(alternatives))
+            for position, rule in enumerate(combined):
+                self._named_from[f"r{rule.index}"] = sorted(combined[position:] + generic,
+                                                            key=lambda rule: rule.index)
+        self._generic = generic
+        by_extension: Dict[str, List[Rule]] = {}
+        for rule in self.rules:
+            for extension in rule.extensions or ():
+                by_extension.setdefault(extension, []).append(rule)
+        self._by_extension = {
+            extension: sorted(rules + generic, key=lambda rule: rule.index) for extension, rules in by_extension.items()
+        }
+        self.set_now(time.time())
+
+    def __bool__(self) -> bool:
+        return bool(self.rules)
+
+    def set_now(self, now: float) -> None:
+        # Age thresholds are relative to the start of each run.
+        for rule in self.rules:
+            rule.set_now(now)
+
+    def match(self, name: str, ext: str, size: Optional[int] = None, mtime: Optional[float] = None) -> Optional[str]:
+        candidates = self._by_extension.get(ext)
+        found = self._names.match(name) if self._names is not None else None
+        if found is None:
+            if candidates is None:
+                candidates = self._generic
+        elif candidates is None:
+            candidates = self._named_from[found.lastgroup]
+        else:
+            candidates = sorted(set(candidates).union(self._named_from[found.lastgroup]), key=lambda rule: rule.index)
+        for rule in candidates:
+            if rule.matches(name, size, mtime):
+                return rule.target_folder(ext, mtime)
+        return None
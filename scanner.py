@@ -0,0 +1,80 @@
+import os
+from typing import Callable, Iterator, List, NamedTuple, Optional
+
+
+class FileRecord(NamedTuple):
+    path: str
+    name: str
+    ext: str
+    size: Optional[int] = None
+    mtime: Optional[float] = None
+
+
+class EntryRecord(NamedTuple):
+    path: str
+    name: str
+    is_dir: bool
+    size: Optional[int] = None
+
+
+def get_extension(name: str) -> str:
+    return os.path.splitext(name)[1][1:].lower()
+
+
+def _stat(entry: os.DirEntry) -> Optional[os.stat_result]:
+    # DirEntry caches the result; on Windows it comes with the readdir data.
+    try:
+        return entry.stat()
+    except OSError:
+        return None
+
+
+def scan(directory: str, prune: Optional[Callable[[str], bool]] = None, with_stat: bool = False,
+         on_directory: Optional[Callable[[str], None]] = None) -> Iterator[FileRecord]:
+    # Single pass over the tree: one scandir per directory, file types come from
+    # the DirEntry and at most one stat per file when sizes/mtimes are wanted.
+    # Like os.walk, symlinked directories are reported but not descended into.
+    if prune is not None and prune(directory):
+        return
+    stack: List[str] = [directory]
+    while stack:
+        try:
+            iterator = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with iterator:
+            for entry in iterator:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    if prune is not None and prune(entry.path):
+                        continue
+                    if on_directory is not None:
+                        on_directory(entry.path)
+                    if not entry.is_symlink():
+                        stack.append(entry.path)
+                    continue
+
+                name = entry.name
+                if with_stat:
+                    stat = _stat(entry)
+                    if stat is not None:
+                        yield FileRecord(entry.path, name, get_extension(name), stat.st_size, stat.st_mtime)
+                        continue
+                yield FileRecord(entry.path, name, get_extension(name))
+
+
+def list_directory(directory: str) -> Iterator[EntryRecord]:
+    with os.scandir(directory) as iterator:
+        for entry in iterator:
+            try:
+                is_file = entry.is_file()
+            except OSError:
+                is_file = False
+            if is_file:
+                stat = _stat(entry)
+                yield EntryRecord(entry.path, entry.name, False, stat.st_size if stat is not None else None)
+            else:
+                yield EntryRecord(entry.path, entry.name, True)
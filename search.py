@@ -0,0 +1,181 @@
+import fnmatch
+import os
+import re
+import time
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, List, NamedTuple, Optional, Pattern
+
+import scanner
+from rules import parse_size
+from scanner import FileRecord
+
+if TYPE_CHECKING:
+    from file_index import FileIndex
+    from organizer import Progress
+
+SEARCH_MODES = ('substring', 'glob', 'regex', 'fuzzy')
+
+_DAY = 86400
+_SEPARATORS = frozenset(" _-.()[]")
+
+
+class SearchResult(NamedTuple):
+    path: str
+    name: str
+    size: Optional[int] = None
+    mtime: Optional[float] = None
+    # Only fuzzy matches are ranked; higher is better.
+    score: int = 0
+
+
+def fuzzy_score(query: str, name: str) -> Optional[int]:
+    # The characters of `query` must appear in order in `name`. Matches that
+    # start the name, follow a separator or a lower-to-upper case change, or
+    # continue the previous match score higher; gaps and long names cost a bit.
+    # Every start position of the first character is tried and the best kept.
+    lowered = name.lower()
+    best: Optional[int] = None
+    start = lowered.find(query[0])
+    while start >= 0:
+        score = 0
+        previous = -2
+        position = start
+        for index, char in enumerate(query):
+            if index:
+                position = lowered.find(char, previous + 1)
+                if position < 0:
+                    break
+            if position == previous + 1:
+                score += 8
+            elif index:
+                score -= min(position - previous - 1, 5)
+            if position == 0:
+                score += 12
+            elif name[position - 1] in _SEPARATORS or (name[position - 1].islower() and name[position].isupper()):
+                score += 6
+            previous = position
+        else:
+            score -= len(name) // 8
+            if best is None or score > best:
+                best = score
+        start = lowered.find(query[0], start + 1)
+    return best
+
+
+class SearchQuery:
+    # A compiled search: the name pattern for the chosen mode plus optional
+    # filters on extension, size and age. Filters are checked cheapest first,
+    # and files are only stat'ed when a size or age filter needs it.
+    def __init__(self, query: str, mode: str = 'substring', extensions: Optional[Iterable[str]] = None,
+                 larger_than=None, smaller_than=None, newer_than_days: Optional[float] = None,
+                 older_than_days: Optional[float] = None):
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"unknown search mode {mode!r}")
+        self.query = query
+        self.mode = mode
+        # Lowercased query of a substring search, which an index can answer in SQL.
+        self.substring = query.lower() if mode == 'substring' else None
+        self._pattern: Optional[Pattern[str]] = None
+        self._fuzzy_query = ""
+        try:
+            if mode == 'glob':
+                self._pattern = re.compile(fnmatch.translate(query), re.IGNORECASE)
+            elif mode == 'regex':
+                self._pattern = re.compile(query, re.IGNORECASE)
+            elif mode == 'fuzzy':
+                # A subsequence regex rejects most names in C before scoring.
+                self._fuzzy_query = "".join(query.lower().split())
+                self._pattern = re.compile(".*?".join(map(re.escape, self._fuzzy_query)), re.IGNORECASE)
+        except re.error as e:
+            raise ValueError(f"invalid {mode} pattern {query!r}: {e}") from e
+        self.extensions = frozenset(ext.strip().lstrip('.').lower() for ext in extensions) if extensions else None
+        self.larger_than = parse_size(larger_than) if larger_than not in (None, "") else None
+        self.smaller_than = parse_size(smaller_than) if smaller_than not in (None, "") else None
+        now = time.time()
+        self.newer_than = now - float(newer_than_days) * _DAY if newer_than_days is not None else None
+        self.older_than = now - float(older_than_days) * _DAY if older_than_days is not None else None
+        self.needs_stat = any(
+            value is not None for value in (self.larger_than, self.smaller_than, self.newer_than, self.older_than)
+        )
+
+    def match_name(self, name: str) -> Optional[int]:
+        # The score of a matching name, or None.
+        if self.mode == 'substring':
+            return 0 if self.substring in name.lower() else None
+        if self.mode == 'glob':
+            return 0 if self._pattern.match(name) is not None else None
+        if self.mode == 'regex':
+            return 0 if self._pattern.search(name) is not None else None
+        if not self._fuzzy_query:
+            return 0
+        if self._pattern.search(name) is None:
+            return None
+        return fuzzy_score(self._fuzzy_query, name)
+
+    def match_stat(self, size: Optional[int], mtime: Optional[float]) -> bool:
+        if size is None or mtime is None:
+            return False
+        if self.larger_than is not None and size <= self.larger_than:
+            return False
+        if self.smaller_than is not None and size >= self.smaller_than:
+            return False
+        if self.newer_than is not None and mtime < self.newer_than:
+            return False
+        if self.older_than is not None and mtime >= self.older_than:
+            return False
+        return True
+
+    def match(self, record: FileRecord) -> Optional[SearchResult]:
+        if self.extensions is not None and record.ext not in self.extensions:
+            return None
+        score = self.match_name(record.name)
+        if score is None:
+            return None
+        if self.needs_stat and not self.match_stat(record.size, record.mtime):
+            return None
+        return SearchResult(record.path, record.name, record.size, record.mtime, score)
+
+
+def iter_search(directory: str, query: SearchQuery, prune: Optional[Callable[[str], bool]] = None,
+                index: Optional['FileIndex'] = None, progress: Optional['Progress'] = None,
+                with_stat: bool = False) -> Iterator[SearchResult]:
+    # Yields matches in walk order as they are found, so the first results
+    # are available long before a large tree has been walked. Directories for
+    # which `prune` returns True are not descended into; with an index their
+    # files are filtered out instead. With `with_stat` matches carry their
+    # size and mtime even when no filter needed them.
+    if index is not None:
+        index.refresh(directory, progress)
+        if progress is not None:
+            if progress.cancelled:
+                return
+            # From here on `scanned` counts the files searched, not indexed.
+            progress.scanned = 0
+        records = index.iter_files(directory, query.substring)
+        if prune is not None:
+            records = (record for record in records if not prune(os.path.dirname(record.path)))
+    else:
+        records = scanner.scan(directory, prune=prune, with_stat=query.needs_stat)
+
+    for record in records:
+        if progress is not None:
+            if progress.cancelled:
+                return
+            progress.scanned += 1
+            progress.report()
+        result = query.match(record)
+        if result is None:
+            continue
+        if with_stat and result.size is None:
+            try:
+                stat = os.stat(result.path)
+            except OSError:
+                pass
+            else:
+                result = result._replace(size=stat.st_size, mtime=stat.st_mtime)
+        yield result
+
+
+def rank(results: Iterable[SearchResult], limit: Optional[int] = None) -> List[SearchResult]:
+    # Best score first; equal scores keep their walk order.
+    ranked = sorted(results, key=lambda result: -result.score)
+    return ranked if limit is None else ranked[:limit]
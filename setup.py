@@ -9,7 +9,8 @@ setup(
     long_description=open('README.md').read(),  
     long_description_content_type='text/markdown',
     url='https://github.com/aaru111/file-organizer.git', 
-    packages=find_packages(), 
+    packages=find_packages(exclude=['benchmarks']), 
+    py_modules=['cli', 'main', 'organizer', 'scanner', 'file_index', 'watcher', 'journal', 'dedupe', 'sniff', 'preview', 'rules', 'transfer', 'search', 'metrics'],
     include_package_data=True,
     install_requires=[
         'PyQt6==6.4.0', 
@@ -22,7 +23,7 @@ setup(
     python_requires='>=3.8', 
     entry_points={
         'console_scripts': [
-            'file-organizer=main:main',  
+            'file-organizer=cli:main',  
         ],
     },
 )
@@ -0,0 +1,168 @@
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_CACHE_PATH = os.path.join("config", "sniff_cache.sqlite3")
+HEADER_SIZE = 4096
+
+# (offset, magic bytes, extension), checked in order. The extension is looked
+# up in the config's file_categories like a real one.
+SIGNATURES: List[Tuple[int, bytes, str]] = [
+    (0, b"%PDF-", "pdf"),
+    (0, b"\x89PNG\r\n\x1a\n", "png"),
+    (0, b"\xff\xd8\xff", "jpg"),
+    (0, b"GIF87a", "gif"),
+    (0, b"GIF89a", "gif"),
+    (0, b"BM", "bmp"),
+    (0, b"RIFF", "riff"),
+    (0, b"OggS", "ogg"),
+    (0, b"fLaC", "flac"),
+    (0, b"ID3", "mp3"),
+    (0, b"\xff\xfb", "mp3"),
+    (0, b"\xff\xf3", "mp3"),
+    (0, b"\x1a\x45\xdf\xa3", "mkv"),
+    (4, b"ftyp", "mp4"),
+    (0, b"{\\rtf", "rtf"),
+    (0, b"PK\x03\x04", "zip"),
+    (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "doc"),
+    (0, b"\x1f\x8b", "gz"),
+    (0, b"7z\xbc\xaf\x27\x1c", "7z"),
+    (0, b"Rar!\x1a\x07", "rar"),
+    (0, b"\x7fELF", "elf"),
+    (0, b"MZ", "exe"),
+]
+
+# Container formats are told apart by what follows the magic bytes.
+_RIFF_TYPES = {b"WAVE": "wav", b"AVI ": "avi", b"WEBP": "webp"}
+_FTYP_BRANDS = {b"qt  ": "mov", b"M4A ": "m4a", b"heic": "heic"}
+_ZIP_MARKERS = [
+    (b"word/", "docx"),
+    (b"xl/", "xlsx"),
+    (b"ppt/", "pptx"),
+    (b"mimetypeapplication/vnd.oasis.opendocument.text", "odt"),
+    (b"mimetypeapplication/epub+zip", "epub"),
+]
+
+FileKey = Tuple[int, int, int, int]
+
+
+def sniff_header(header: bytes) -> Optional[str]:
+    for offset, magic, extension in SIGNATURES:
+        if header.startswith(magic, offset):
+            break
+    else:
+        return _sniff_text(header)
+
+    # Two-byte magics are common at the start of text, so check their headers.
+    if extension == "bmp":
+        return extension if header[6:10] == b"\0\0\0\0" else None
+    if extension == "exe":
+        pe_offset = int.from_bytes(header[0x3c:0x40], 'little')
+        return extension if header[pe_offset:pe_offset + 4] == b"PE\0\0" else None
+    if extension == "riff":
+        return _RIFF_TYPES.get(header[8:12])
+    if extension == "mp4":
+        return _FTYP_BRANDS.get(header[8:12], "mp4")
+    if extension == "zip":
+        return next((marker_extension for marker, marker_extension in _ZIP_MARKERS if marker in header), "zip")
+    return extension
+
+
+def _sniff_text(header: bytes) -> Optional[str]:
+    start = header.lstrip()[:64].lower()
+    if start.startswith((b"<!doctype html", b"<html")):
+        return "html"
+    if start.startswith(b"#!") and b"python" in header.split(b"\n", 1)[0]:
+        return "py"
+    return None
+
+
+def sniff_file(path: str, header_size: int = HEADER_SIZE) -> Optional[str]:
+    with open(path, 'rb') as f:
+        return sniff_header(f.read(header_size))
+
+
+class SniffCache:
+    # Sniffed extensions keyed by (device, inode, size, mtime); an empty string
+    # records that a file matched no signature, so it is not read again either.
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS sniffed (device INTEGER, inode INTEGER, size INTEGER, mtime INTEGER, "
+            "extension TEXT NOT NULL, PRIMARY KEY (device, inode, size, mtime))")
+
+    def get(self, key: FileKey) -> Optional[str]:
+        row = self._connection.execute(
+            "SELECT extension FROM sniffed WHERE device = ? AND inode = ? AND size = ? AND mtime = ?",
+            key).fetchone()
+        return row[0] if row else None
+
+    def put_many(self, rows: Iterable[Tuple[FileKey, str]]) -> None:
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO sniffed (device, inode, size, mtime, extension) VALUES (?, ?, ?, ?, ?)",
+                [key + (extension,) for key, extension in rows])
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+class ContentSniffer:
+    # Reads at most `header_size` bytes per file on a thread pool; with a cache
+    # only files that changed since the last run are opened.
+    def __init__(self, cache: Optional[SniffCache] = None, max_workers: Optional[int] = None,
+                 header_size: int = HEADER_SIZE):
+        self.cache = cache
+        self.max_workers = max_workers or min(16, (os.cpu_count() or 1) * 2)
+        self.header_size = header_size
+
+    def sniff_many(self, paths: List[str]) -> Dict[str, str]:
+        # Returns path -> extension for the files that matched a signature.
+        if not paths:
+            return {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            if self.cache is None:
+                results = zip(paths, executor.map(self._sniff, paths))
+                return {path: extension for path, extension in results if extension}
+
+            sniffed: Dict[str, str] = {}
+            misses: List[Tuple[str, FileKey]] = []
+            for path, key in zip(paths, executor.map(self._key, paths)):
+                if key is None:
+                    continue
+                extension = self.cache.get(key)
+                if extension is None:
+                    misses.append((path, key))
+                elif extension:
+                    sniffed[path] = extension
+
+            results = executor.map(self._sniff, [path for path, _ in misses])
+            rows = []
+            for (path, key), extension in zip(misses, results):
+                if extension is None:
+                    # Unreadable: try again next time.
+                    continue
+                rows.append((key, extension))
+                if extension:
+                    sniffed[path] = extension
+        self.cache.put_many(rows)
+        return sniffed
+
+    @staticmethod
+    def _key(path: str) -> Optional[FileKey]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _sniff(self, path: str) -> Optional[str]:
+        try:
+            return sniff_file(path, self.header_size) or ""
+        except OSError:
+            return None
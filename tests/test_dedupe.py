@@ -0,0 +1,91 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from journal import MoveJournal  # noqa: E402
+from organizer import DUPLICATES_FOLDER, ConfigManager, SyncFileOrganizer, link_file, restore_files  # noqa: E402
+
+TEXT = os.path.join("Documents", "TXT")
+
+
+def make_tree(root):
+    for folder, name, content in (("a", "report.txt", b"same"), ("b", "report.txt", b"same"),
+                                  ("b", "notes.txt", b"different")):
+        os.makedirs(os.path.join(root, folder), exist_ok=True)
+        with open(os.path.join(root, folder, name), 'wb') as f:
+            f.write(content)
+
+
+def organize(tmp_path, policy):
+    root = str(tmp_path / "root")
+    make_tree(root)
+    config_dir = str(tmp_path / "config")
+    config = ConfigManager(config_dir).config
+    config["duplicate_policy"] = policy
+    organizer = SyncFileOrganizer(config, state_dir=config_dir)
+    with MoveJournal.for_directory(config_dir, root) as journal:
+        moved = asyncio.run(organizer.organize_files(root, journal=journal))
+    return root, moved
+
+
+def files_under(root):
+    return sorted(os.path.relpath(os.path.join(directory, name), root)
+                  for directory, _, names in os.walk(root) for name in names)
+
+
+def test_skip_leaves_the_duplicate_in_place(tmp_path):
+    root, moved = organize(tmp_path, 'skip')
+    assert len(moved) == 2
+    files = files_under(root)
+    assert os.path.join(TEXT, "report.txt") in files
+    assert os.path.join(TEXT, "notes.txt") in files
+    assert len([path for path in files if path.endswith("report.txt")]) == 2
+    assert len([path for path in files if path.startswith(("a", "b"))]) == 1
+
+
+def test_hardlink_organizes_the_duplicate_as_a_link(tmp_path):
+    root, moved = organize(tmp_path, 'hardlink')
+    assert len(moved) == 3
+    first = os.stat(os.path.join(root, TEXT, "report.txt"))
+    second = os.stat(os.path.join(root, TEXT, "report (1).txt"))
+    assert (first.st_dev, first.st_ino) == (second.st_dev, second.st_ino)
+    assert first.st_nlink == 2
+    assert os.stat(os.path.join(root, TEXT, "notes.txt")).st_nlink == 1
+    assert not [name for name in os.listdir(os.path.join(root, TEXT)) if name.endswith(".link")]
+
+
+def test_move_puts_the_duplicate_in_the_duplicates_folder(tmp_path):
+    root, moved = organize(tmp_path, 'move')
+    assert len(moved) == 3
+    assert os.listdir(os.path.join(root, DUPLICATES_FOLDER)) == ["report.txt"]
+    assert sorted(os.listdir(os.path.join(root, TEXT))) == ["notes.txt", "report.txt"]
+
+
+def test_hardlinked_duplicates_restore(tmp_path):
+    root, _ = organize(tmp_path, 'hardlink')
+    config_dir = str(tmp_path / "config")
+    asyncio.run(restore_files(MoveJournal.for_directory(config_dir, root), root))
+    assert files_under(root) == [os.path.join("a", "report.txt"), os.path.join("b", "notes.txt"),
+                                 os.path.join("b", "report.txt")]
+
+
+def test_link_file_keeps_existing_files_next_to_the_target(tmp_path):
+    keeper = tmp_path / "keeper.txt"
+    keeper.write_text("same")
+    target = tmp_path / "dup.txt"
+    target.write_text("same")
+    (tmp_path / "dup.txt.link").write_text("user data")
+    assert link_file(str(keeper), str(target))
+    assert os.stat(target).st_ino == os.stat(keeper).st_ino
+    assert (tmp_path / "dup.txt.link").read_text() == "user data"
+    assert sorted(os.listdir(tmp_path)) == ["dup.txt", "dup.txt.link", "keeper.txt"]
+
+
+def test_link_file_fails_softly_and_cleans_up(tmp_path):
+    target = tmp_path / "dup.txt"
+    target.write_text("same")
+    assert not link_file(str(tmp_path / "missing.txt"), str(target))
+    assert target.read_text() == "same"
+    assert os.listdir(tmp_path) == ["dup.txt"]
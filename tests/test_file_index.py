@@ -0,0 +1,59 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_index import FileIndex  # noqa: E402
+from organizer import Progress, get_directory_stats  # noqa: E402
+from search import SearchQuery, iter_search  # noqa: E402
+
+
+def make_tree(root, folders=20, files=5):
+    for folder in range(folders):
+        directory = root / f"d{folder}" / "sub"
+        directory.mkdir(parents=True)
+        for index in range(files):
+            (directory / f"f{index}.txt").write_text("x" * index)
+
+
+def cancel_after(files):
+    def callback(progress):
+        if progress.scanned >= files:
+            progress.cancel()
+    return Progress(callback, interval=0)
+
+
+def test_refresh_reports_progress(tmp_path):
+    make_tree(tmp_path / "root")
+    index = FileIndex(str(tmp_path / "index.sqlite3"))
+    progress = Progress()
+    assert get_directory_stats(str(tmp_path / "root"), index, progress) == get_directory_stats(str(tmp_path / "root"))
+    assert progress.scanned == 100
+    index.close()
+
+
+def test_cancelled_refresh_stops_and_the_next_one_completes(tmp_path):
+    root = tmp_path / "root"
+    make_tree(root)
+    index = FileIndex(str(tmp_path / "index.sqlite3"))
+    progress = cancel_after(10)
+    files, _, _ = get_directory_stats(str(root), index, progress)
+    assert progress.cancelled
+    assert 10 <= files < 100
+
+    # The folders the cancelled refresh did not reach are listed now, even
+    # though the folders above them are unchanged.
+    assert get_directory_stats(str(root), index) == get_directory_stats(str(root))
+    assert index.refresh(str(root)) == 0
+    index.close()
+
+
+def test_indexed_search_can_be_cancelled_while_refreshing(tmp_path):
+    make_tree(tmp_path / "root")
+    index = FileIndex(str(tmp_path / "index.sqlite3"))
+    progress = cancel_after(10)
+    assert list(iter_search(str(tmp_path / "root"), SearchQuery("f1"), index=index, progress=progress)) == []
+    progress = Progress()
+    assert len(list(iter_search(str(tmp_path / "root"), SearchQuery("f1"), index=index, progress=progress))) == 20
+    assert progress.scanned == 20
+    index.close()
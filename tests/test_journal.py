@@ -0,0 +1,133 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from journal import MoveJournal  # noqa: E402
+from organizer import ConfigManager, Progress, SyncFileOrganizer, restore_files  # noqa: E402
+
+MOVES = [(f"/src/dir{index % 7}/file {index}.txt", f"/dst/Documents/file {index}.txt") for index in range(200)]
+
+
+def write_journal(path, moves):
+    with MoveJournal(str(path)) as journal:
+        journal.record_many(moves)
+    return MoveJournal(str(path))
+
+
+def line_offsets(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    offsets = [0]
+    for index, byte in enumerate(data[:-1]):
+        if byte == ord("\n"):
+            offsets.append(index + 1)
+    return offsets
+
+
+def snapshot(root):
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            with open(path, 'rb') as f:
+                files[os.path.relpath(path, root)] = f.read()
+    return files
+
+
+def cancel_after(restored):
+    # A progress that cancels the restore once `restored` files are back.
+    def callback(progress):
+        if progress.moved >= restored:
+            progress.cancel()
+    return Progress(callback, interval=0)
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 3, 17, 64, 1 << 16])
+def test_iter_reverse_yields_line_offsets_newest_first(tmp_path, block_size):
+    journal = write_journal(tmp_path / "journal.jsonl", MOVES)
+    entries = list(journal.iter_reverse(block_size))
+    assert [(old, new) for _, old, new in entries] == MOVES[::-1]
+    assert [offset for offset, _, _ in entries] == line_offsets(journal.path)[::-1]
+
+
+def test_truncate_at_offset_keeps_older_records(tmp_path):
+    journal = write_journal(tmp_path / "journal.jsonl", MOVES)
+    offset = [offset for offset, _, _ in journal.iter_reverse(5)][49]
+    journal.truncate(offset)
+    assert [(old, new) for _, old, new in journal.iter_reverse(5)] == MOVES[:150][::-1]
+    journal.truncate()
+    assert not journal
+    assert list(journal.iter_reverse()) == []
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    journal = write_journal(tmp_path / "journal.jsonl", MOVES[:3])
+    with open(journal.path, 'ab') as f:
+        f.write(b'["/src/torn.txt", "/dst/to')
+    entries = list(journal.iter_reverse(4))
+    assert [(old, new) for _, old, new in entries] == MOVES[:3][::-1]
+    # Truncating behind the oldest restored record drops the torn line too.
+    journal.truncate(entries[-1][0])
+    assert not journal
+
+
+def test_surrogate_escaped_paths_round_trip(tmp_path):
+    name = os.fsdecode(b"caf\xe9 \xff.txt")
+    moves = [(f"/src/{name}", f"/dst/Documents/{name}"), ("/src/plain.txt", "/dst/plain.txt")]
+    journal = write_journal(tmp_path / "journal.jsonl", moves)
+    assert [(old, new) for _, old, new in journal.iter_reverse(3)] == moves[::-1]
+    assert MoveJournal.for_directory(str(tmp_path), f"/data/{name}").path.endswith(".jsonl")
+
+
+def test_interrupted_restore_resumes(tmp_path):
+    root = tmp_path / "root"
+    moves = []
+    for index in range(10):
+        (root / "new").mkdir(parents=True, exist_ok=True)
+        new_path = root / "new" / f"f{index}.txt"
+        new_path.write_text(str(index))
+        moves.append((str(root / "old" / f"f{index}.txt"), str(new_path)))
+    journal = write_journal(tmp_path / "journal.jsonl", moves)
+
+    restored = asyncio.run(restore_files(journal, str(root), cancel_after(3), batch_size=3))
+    assert restored == 3
+    assert [(old, new) for _, old, new in journal.iter_reverse()] == moves[:7][::-1]
+    assert sorted(os.listdir(root / "old")) == ["f7.txt", "f8.txt", "f9.txt"]
+
+    assert asyncio.run(restore_files(journal, str(root), batch_size=3)) == 7
+    assert not journal
+    assert sorted(os.listdir(root / "old")) == [f"f{index}.txt" for index in range(10)]
+    assert not (root / "new").exists()
+
+
+def test_organize_interrupt_restore_resume_round_trip(tmp_path):
+    root = tmp_path / "root"
+    names = ["report.pdf", "photo.jpg", "song.mp3", "notes.txt", "archive.zip", "README",
+             os.fsdecode(b"r\xe9sum\xe9.docx")]
+    for folder in ("", "a", os.path.join("a", "b"), "c"):
+        (root / folder).mkdir(parents=True, exist_ok=True)
+        for name in names:
+            (root / folder / name).write_bytes(os.fsencode(os.path.join(folder, name)))
+    before = snapshot(root)
+
+    config_dir = str(tmp_path / "config")
+    organizer = SyncFileOrganizer(ConfigManager(config_dir).config, state_dir=config_dir)
+    with MoveJournal.for_directory(config_dir, str(root)) as journal:
+        moved = asyncio.run(organizer.organize_files(str(root), journal=journal))
+    assert len(moved) == len(before)
+    assert snapshot(root) != before
+
+    journal = MoveJournal.for_directory(config_dir, str(root))
+    restored = asyncio.run(restore_files(journal, str(root), cancel_after(5), batch_size=5))
+    assert 0 < restored < len(before)
+    assert journal
+
+    journal = MoveJournal.for_directory(config_dir, str(root))
+    assert asyncio.run(restore_files(journal, str(root), batch_size=5)) == len(before) - restored
+    assert not journal
+    assert snapshot(root) == before
+    assert sorted(os.listdir(root)) == sorted(["a", "c"] + names)
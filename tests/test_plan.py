@@ -0,0 +1,52 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cli  # noqa: E402
+from organizer import OrganizationPlan  # noqa: E402
+
+
+def make_tree(root):
+    for path in ("a.txt", os.path.join("s", "b.pdf"), "c.jpg"):
+        os.makedirs(os.path.dirname(os.path.join(root, path)), exist_ok=True)
+        with open(os.path.join(root, path), 'w') as f:
+            f.write(path)
+
+
+def files_under(root):
+    return sorted(os.path.relpath(os.path.join(directory, name), root)
+                  for directory, _, names in os.walk(root) for name in names)
+
+
+def test_saved_plan_is_applied_later(tmp_path, capsys):
+    root = str(tmp_path / "root")
+    make_tree(root)
+    config = ["--config-dir", str(tmp_path / "config")]
+    plan_path = str(tmp_path / "plan.json")
+
+    assert cli.main(config + ["organize", root, "--dry-run", "--plan", plan_path]) == 0
+    assert files_under(root) == ["a.txt", "c.jpg", os.path.join("s", "b.pdf")]
+    assert len(OrganizationPlan.load(plan_path)) == 3
+
+    os.unlink(os.path.join(root, "c.jpg"))
+    capsys.readouterr()
+    assert cli.main(config + ["organize", root, "--apply-plan", plan_path]) == 0
+    assert "Moved 2 files." in capsys.readouterr().out
+    assert files_under(root) == [os.path.join("Documents", "PDF", "b.pdf"), os.path.join("Documents", "TXT", "a.txt")]
+    # No folder is left behind for the file that vanished.
+    assert not os.path.exists(os.path.join(root, "Images"))
+
+    assert cli.main(config + ["restore", root]) == 0
+    assert files_under(root) == ["a.txt", os.path.join("s", "b.pdf")]
+
+
+def test_plan_for_another_directory_is_refused(tmp_path, capsys):
+    root = str(tmp_path / "root")
+    make_tree(root)
+    config = ["--config-dir", str(tmp_path / "config")]
+    plan_path = str(tmp_path / "plan.json")
+    assert cli.main(config + ["organize", root, "--dry-run", "--plan", plan_path]) == 0
+    assert cli.main(config + ["organize", str(tmp_path), "--apply-plan", plan_path]) == 1
+    assert "is a plan for" in capsys.readouterr().err
+    assert files_under(root) == ["a.txt", "c.jpg", os.path.join("s", "b.pdf")]
@@ -0,0 +1,86 @@
+import fnmatch
+import os
+import random
+import re
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rules import RuleEngine  # noqa: E402
+
+REGEXES = [r"(ab)\1", r"^foo|bar", r"^report", r"^(foo|ab)\d", r"^[|x]b", r"x\d+", r"(?i)INV",
+           r"(?P<n>z)(?P=n)", r"a.c$", r"draft", r"(?i:final)"]
+GLOBS = ["invoice_*", "*.tmp", "*a*b*", "IMG_????.jpg", "*report*"]
+EXTENSIONS = ["txt", "pdf", "jpg", "dat", "tmp", ""]
+PARTS = ["ab", "abab", "foo", "xbar", "bar", "report", "x12", "inv", "INV", "zz", "abc", "draft", "FINAL", "invoice_",
+         "IMG_", "1234", "_", "-", "q"]
+
+
+def naive_match(config, name, ext, size, mtime, now):
+    # Every rule in order, straight from the config, without any indexing.
+    for rule in config:
+        extensions = rule.get("extensions")
+        if extensions and ext not in extensions:
+            continue
+        if "glob" in rule and not fnmatch.fnmatchcase(name.lower(), rule["glob"].lower()):
+            continue
+        if "regex" in rule and re.search(rule["regex"], name) is None:
+            continue
+        if "larger_than" in rule and size <= rule["larger_than"]:
+            continue
+        if "older_than_days" in rule and mtime >= now - rule["older_than_days"] * 86400:
+            continue
+        return rule["folder"]
+    return None
+
+
+def random_rule(rng, index):
+    rule = {"folder": f"R{index}"}
+    kind = rng.random()
+    if kind < 0.45:
+        rule["regex"] = rng.choice(REGEXES)
+    elif kind < 0.75:
+        rule["glob"] = rng.choice(GLOBS)
+    if rng.random() < 0.3:
+        rule["extensions"] = rng.sample(EXTENSIONS[:-1], 2)
+    if rng.random() < 0.2:
+        rule["larger_than"] = rng.choice([10, 1000])
+    if rng.random() < 0.1:
+        rule["older_than_days"] = 30
+    return rule
+
+
+def random_name(rng):
+    stem = "".join(rng.choice(PARTS) for _ in range(rng.randint(1, 3)))
+    ext = rng.choice(EXTENSIONS)
+    return (f"{stem}.{ext}" if ext else stem), ext
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_engine_matches_naive_first_match(seed):
+    rng = random.Random(seed)
+    config = [random_rule(rng, index) for index in range(rng.randint(1, 12))]
+    engine = RuleEngine(config)
+    now = time.time()
+    engine.set_now(now)
+    for _ in range(300):
+        name, ext = random_name(rng)
+        size = rng.choice([0, 100, 5000])
+        mtime = now - rng.choice([0, 90]) * 86400
+        assert engine.match(name, ext, size, mtime) == naive_match(config, name, ext, size, mtime, now), name
+
+
+def test_backreference_still_matches_next_to_other_name_rules():
+    engine = RuleEngine([{"folder": "Other", "glob": "*.tmp"}, {"folder": "Repeated", "regex": r"(ab)\1"}])
+    assert engine.match("abab.dat", "dat") == "Repeated"
+    assert engine.match("abba.dat", "dat") is None
+
+
+def test_regex_starting_with_caret_is_searched_anywhere():
+    engine = RuleEngine([{"folder": "Other", "glob": "*.tmp"}, {"folder": "Found", "regex": "^foo|bar"}])
+    assert engine.match("xbar.txt", "txt") == "Found"
+    assert engine.match("foo.txt", "txt") == "Found"
+    assert engine.match("xfoo.txt", "txt") is None
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_index import FileIndex  # noqa: E402
+from organizer import ConfigManager, SyncFileOrganizer  # noqa: E402
+from search import SearchQuery  # noqa: E402
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "root"
+    for path in ("notes.txt", "a/notes.txt", "private/notes.txt", "private/deep/notes.txt",
+                 "config/notes.txt", "config/journals/notes.txt"):
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_text("x")
+    config_dir = str(root / "config")
+    config = ConfigManager(config_dir).config
+    config["blacklisted_directories"] = [str(root / "private")]
+    return root, SyncFileOrganizer(config, state_dir=config_dir)
+
+
+def found(organizer, root, index=None):
+    return sorted(os.path.relpath(result.path, root)
+                  for result in organizer.search(str(root), SearchQuery("notes"), index=index))
+
+
+def test_indexed_search_prunes_like_a_walk(tree, tmp_path):
+    root, organizer = tree
+    index = FileIndex(str(tmp_path / "index.sqlite3"))
+    expected = [os.path.join("a", "notes.txt"), "notes.txt"]
+    assert found(organizer, root) == expected
+    assert found(organizer, root, index) == expected
+    index.close()
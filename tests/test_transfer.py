@@ -0,0 +1,105 @@
+import errno
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import transfer  # noqa: E402
+from transfer import TransferCancelled, TransferPool, copy_file  # noqa: E402
+
+DATA = bytes(range(256)) * 400
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.bin"
+    path.write_bytes(DATA)
+    return path
+
+
+def leftovers(folder):
+    return sorted(name for name in os.listdir(folder) if name.endswith(".partial"))
+
+
+def copies_nothing(*args):
+    return 0
+
+
+def copies_some_then_nothing(call, limit):
+    # Copies up to `limit` bytes with `call`, then reports end of file.
+    done = []
+
+    def partial(*args):
+        if sum(done) >= limit:
+            return 0
+        sent = call(*args)
+        done.append(sent)
+        return sent
+    return partial
+
+
+def test_copy_file_range_returning_zero_falls_back_to_sendfile(tmp_path, source, monkeypatch):
+    sendfile = os.sendfile
+    calls = []
+    monkeypatch.setattr(os, 'copy_file_range', copies_nothing, raising=False)
+    monkeypatch.setattr(os, 'sendfile', lambda *args: calls.append(args) or sendfile(*args))
+    copy_file(str(source), str(tmp_path / "target.bin"))
+    assert (tmp_path / "target.bin").read_bytes() == DATA
+    assert calls
+
+
+def test_kernel_copies_returning_zero_fall_back_to_buffered(tmp_path, source, monkeypatch):
+    monkeypatch.setattr(os, 'copy_file_range', copies_nothing, raising=False)
+    monkeypatch.setattr(os, 'sendfile', copies_nothing)
+    copy_file(str(source), str(tmp_path / "target.bin"))
+    assert (tmp_path / "target.bin").read_bytes() == DATA
+
+
+@pytest.mark.skipif(not hasattr(os, 'copy_file_range'), reason="needs os.copy_file_range")
+def test_fallback_continues_where_the_kernel_copy_stopped(tmp_path, source, monkeypatch):
+    monkeypatch.setattr(transfer, 'CHUNK_SIZE', 4096)
+    monkeypatch.setattr(os, 'copy_file_range', copies_some_then_nothing(os.copy_file_range, 10000))
+    monkeypatch.setattr(os, 'sendfile', copies_some_then_nothing(os.sendfile, 30000))
+    copy_file(str(source), str(tmp_path / "target.bin"))
+    assert (tmp_path / "target.bin").read_bytes() == DATA
+
+
+def test_short_copy_fails_and_keeps_the_source(tmp_path, source, monkeypatch):
+    monkeypatch.setattr(transfer, '_copy_range', lambda *args: None)
+    with TransferPool() as pool:
+        future = pool.submit(str(source), str(tmp_path / "target.bin"))
+    with pytest.raises(OSError) as raised:
+        future.result()
+    assert raised.value.errno == errno.EIO
+    assert source.read_bytes() == DATA
+    assert not (tmp_path / "target.bin").exists()
+    assert leftovers(tmp_path) == []
+
+
+def test_verify_mismatch_fails_and_cleans_up(tmp_path, source, monkeypatch):
+    monkeypatch.setattr(transfer, '_hash_file', lambda path: b"not the source")
+    with pytest.raises(OSError) as raised:
+        copy_file(str(source), str(tmp_path / "target.bin"), verify=True)
+    assert raised.value.errno == errno.EIO
+    assert not (tmp_path / "target.bin").exists()
+    assert leftovers(tmp_path) == []
+
+
+def test_cancelled_copy_removes_the_temporary_file(tmp_path, source, monkeypatch):
+    monkeypatch.setattr(transfer, 'BUFFER_SIZE', 1024)
+    copied = []
+    with pytest.raises(TransferCancelled):
+        copy_file(str(source), str(tmp_path / "target.bin"), verify=True,
+                  on_bytes=copied.append, cancelled=lambda: bool(copied))
+    assert copied
+    assert not (tmp_path / "target.bin").exists()
+    assert leftovers(tmp_path) == []
+
+
+def test_existing_partial_name_is_not_touched(tmp_path, source):
+    (tmp_path / "target.bin.partial").write_bytes(b"user data")
+    copy_file(str(source), str(tmp_path / "target.bin"))
+    assert (tmp_path / "target.bin.partial").read_bytes() == b"user data"
+    assert (tmp_path / "target.bin").read_bytes() == DATA
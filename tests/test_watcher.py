@@ -0,0 +1,56 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from organizer import ConfigManager, SyncFileOrganizer, execute_plan  # noqa: E402
+from watcher import DirectoryWatcher  # noqa: E402
+
+TEXT = os.path.join("Documents", "TXT")
+
+
+def make_watcher(tmp_path, **kwargs):
+    root = tmp_path / "root"
+    root.mkdir()
+    config_dir = str(tmp_path / "config")
+    organizer = SyncFileOrganizer(ConfigManager(config_dir).config, state_dir=config_dir)
+    return root, DirectoryWatcher(str(root), organizer, settle=0, interval=0.01, use_watchdog=False, **kwargs)
+
+
+def test_vanished_files_are_skipped(tmp_path):
+    root, watcher = make_watcher(tmp_path)
+    (root / "ok.txt").write_text("ok")
+    (root / "gone.txt").write_text("gone")
+    plan = watcher.organizer.plan_files(str(root), [str(root / "gone.txt"), str(root / "ok.txt")])
+    os.unlink(root / "gone.txt")
+    moved = execute_plan(plan)
+    assert moved == [(str(root / "ok.txt"), str(root / TEXT / "ok.txt"))]
+    assert os.listdir(root / TEXT) == ["ok.txt"]
+
+
+def test_a_failing_batch_does_not_stop_the_watch(tmp_path, monkeypatch):
+    errors = []
+    moved = []
+    root, watcher = make_watcher(tmp_path, on_error=errors.append, on_moved=moved.extend)
+    organize = watcher._organize
+
+    def flaky(paths):
+        if not errors:
+            (root / "second.txt").write_text("2")
+            watcher.notify(str(root / "second.txt"))
+            raise PermissionError("denied")
+        organize(paths)
+        watcher.stop()
+    monkeypatch.setattr(watcher, '_organize', flaky)
+
+    (root / "first.txt").write_text("1")
+    watcher.notify(str(root / "first.txt"))
+    timeout = threading.Timer(10, watcher.stop)
+    timeout.start()
+    try:
+        watcher.run(organize_existing=False)
+    finally:
+        timeout.cancel()
+    assert len(errors) == 1 and isinstance(errors[0], PermissionError)
+    assert moved == [(str(root / "second.txt"), str(root / TEXT / "second.txt"))]
@@ -0,0 +1,232 @@
+import errno
+import hashlib
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from metrics import Metrics
+
+CHUNK_SIZE = 64 * 1024 * 1024
+BUFFER_SIZE = 1024 * 1024
+LARGE_FILE = 256 * 1024 * 1024
+
+
+class TransferCancelled(Exception):
+    pass
+
+
+def _copy_range(source_fd: int, target_fd: int, size: int, on_bytes: Callable[[int], None],
+                cancelled: Callable[[], bool]) -> None:
+    # Kernel-side copies first: copy_file_range (reflinks or server-side copies
+    # on filesystems that support them), then sendfile, then a plain loop.
+    # A call that copies nothing before `size` (procfs, some FUSE filesystems)
+    # hands the rest to the next way instead of ending the copy early.
+    copied = 0
+    for call in (getattr(os, 'copy_file_range', None), getattr(os, 'sendfile', None)):
+        if call is None:
+            continue
+        try:
+            while copied < size:
+                if cancelled():
+                    raise TransferCancelled()
+                if call is os.sendfile:
+                    sent = os.sendfile(target_fd, source_fd, copied, min(CHUNK_SIZE, size - copied))
+                else:
+                    sent = call(source_fd, target_fd, min(CHUNK_SIZE, size - copied), copied, copied)
+                if not sent:
+                    break
+                copied += sent
+                on_bytes(sent)
+        except OSError as e:
+            # Not supported for this pair of files; fall through to the next way.
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP,
+                               errno.EBADF, errno.ETXTBSY, errno.ENOTSOCK):
+                raise
+        if copied >= size:
+            return
+        # copy_file_range leaves the file position alone; sendfile writes at it.
+        os.lseek(target_fd, copied, os.SEEK_SET)
+    _copy_buffered(source_fd, target_fd, copied, on_bytes, cancelled)
+
+
+def _copy_buffered(source_fd: int, target_fd: int, offset: int, on_bytes: Callable[[int], None],
+                   cancelled: Callable[[], bool], hasher=None) -> None:
+    buffer = bytearray(BUFFER_SIZE)
+    view = memoryview(buffer)
+    os.lseek(source_fd, offset, os.SEEK_SET)
+    os.lseek(target_fd, offset, os.SEEK_SET)
+    with open(source_fd, 'rb', buffering=0, closefd=False) as source:
+        while True:
+            if cancelled():
+                raise TransferCancelled()
+            read = source.readinto(buffer)
+            if not read:
+                return
+            if hasher is not None:
+                hasher.update(view[:read])
+            written = 0
+            while written < read:
+                written += os.write(target_fd, view[written:read])
+            on_bytes(read)
+
+
+def _hash_file(path: str) -> bytes:
+    hasher = hashlib.blake2b()
+    buffer = bytearray(BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                return hasher.digest()
+            hasher.update(view[:read])
+
+
+def copy_file(source_path: str, target_path: str, verify: bool = False,
+              on_bytes: Optional[Callable[[int], None]] = None,
+              cancelled: Optional[Callable[[], bool]] = None) -> None:
+    # Copies into a temporary name next to the target and renames it into
+    # place, so an interrupted copy never leaves a truncated file under the
+    # real name. With `verify` the source is hashed while it is copied and the
+    # target is read back and compared before returning. Only regular files
+    # are copied: symlinks are not followed and FIFOs are not waited on.
+    on_bytes = on_bytes or (lambda _: None)
+    cancelled = cancelled or (lambda: False)
+    source_fd = os.open(source_path, os.O_RDONLY | getattr(os, 'O_NOFOLLOW', 0) | getattr(os, 'O_NONBLOCK', 0))
+    temporary_path = None
+    try:
+        source_stat = os.fstat(source_fd)
+        if not stat.S_ISREG(source_stat.st_mode):
+            raise OSError(errno.EINVAL, "not a regular file", source_path)
+        # A fresh name, so no existing file can be truncated; copystat sets the mode.
+        target_fd, temporary_path = tempfile.mkstemp(
+            prefix="." + os.path.basename(target_path) + ".", suffix=".partial",
+            dir=os.path.dirname(target_path) or None)
+        try:
+            if verify:
+                hasher = hashlib.blake2b()
+                _copy_buffered(source_fd, target_fd, 0, on_bytes, cancelled, hasher)
+            else:
+                _copy_range(source_fd, target_fd, source_stat.st_size, on_bytes, cancelled)
+            # The source is deleted after this returns, so a short copy must fail here.
+            if os.fstat(target_fd).st_size != source_stat.st_size:
+                raise OSError(errno.EIO, "copy is shorter than the source", target_path)
+            os.fsync(target_fd)
+        finally:
+            os.close(target_fd)
+        shutil.copystat(source_path, temporary_path)
+        if verify and _hash_file(temporary_path) != hasher.digest():
+            raise OSError(errno.EIO, "copy does not match the source", target_path)
+        os.replace(temporary_path, target_path)
+    except BaseException:
+        if temporary_path is not None and os.path.lexists(temporary_path):
+            os.unlink(temporary_path)
+        raise
+    finally:
+        os.close(source_fd)
+
+
+def is_regular_file(path: str) -> bool:
+    # Without following symlinks; a dangling link is not a regular file either.
+    return stat.S_ISREG(os.lstat(path).st_mode)
+
+
+def move_file(source_path: str, target_path: str, verify: bool = False) -> None:
+    # A rename where possible, otherwise copy_file and delete the source.
+    # Directories, symlinks and special files are left to shutil.move, which
+    # recreates links and refuses to copy FIFOs and devices.
+    try:
+        os.replace(source_path, target_path)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    if not is_regular_file(source_path):
+        shutil.move(source_path, target_path)
+        return
+    copy_file(source_path, target_path, verify)
+    os.unlink(source_path)
+
+
+class TransferPool:
+    # Cross-device moves on a small thread pool. Copies of files larger than
+    # `large_file` bytes also take a slot of a semaphore, so a few huge media
+    # files do not all compete for the same disks while small files keep
+    # flowing through the remaining workers.
+    def __init__(self, max_workers: int = 4, max_large: int = 2, large_file: int = LARGE_FILE,
+                 verify: bool = False, cancelled: Optional[Callable[[], bool]] = None,
+                 metrics: Optional['Metrics'] = None):
+        self.verify = verify
+        # Receives the duration of each copy as the 'copy' phase.
+        self.metrics = metrics
+        self.large_file = large_file
+        self.bytes = 0
+        self._cancelled = cancelled or (lambda: False)
+        self._large = threading.BoundedSemaphore(max_large)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._futures: List[Future] = []
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+
+    def __enter__(self) -> 'TransferPool':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+
+    def submit(self, source_path: str, target_path: str) -> 'Future[Optional[Tuple[str, str]]]':
+        if self._started is None:
+            self._started = time.monotonic()
+        future = self._executor.submit(self._move, source_path, target_path)
+        self._futures.append(future)
+        return future
+
+    def _add_bytes(self, count: int) -> None:
+        with self._lock:
+            self.bytes += count
+
+    def _move(self, source_path: str, target_path: str) -> Optional[Tuple[str, str]]:
+        # None when the source no longer exists, e.g. deleted since it was planned.
+        if self._cancelled():
+            raise TransferCancelled()
+        try:
+            source_stat = os.lstat(source_path)
+        except FileNotFoundError:
+            return None
+        if not stat.S_ISREG(source_stat.st_mode):
+            shutil.move(source_path, target_path)
+            return source_path, target_path
+        if source_stat.st_size < self.large_file:
+            start = time.perf_counter()
+            copy_file(source_path, target_path, self.verify, self._add_bytes, self._cancelled)
+        else:
+            with self._large:
+                start = time.perf_counter()
+                copy_file(source_path, target_path, self.verify, self._add_bytes, self._cancelled)
+        if self.metrics is not None:
+            self.metrics.add('copy', time.perf_counter() - start)
+        os.unlink(source_path)
+        return source_path, target_path
+
+    @property
+    def futures(self) -> List[Future]:
+        return list(self._futures)
+
+    @property
+    def bytes_per_second(self) -> float:
+        if self._started is None:
+            return 0.0
+        elapsed = (self._finished or time.monotonic()) - self._started
+        return self.bytes / elapsed if elapsed > 0 else 0.0
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+        if self._started is not None and self._finished is None:
+            self._finished = time.monotonic()
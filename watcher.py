@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from journal import MoveJournal
+from organizer import FileOrganizer, execute_plan
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+# Names used by browsers and downloaders while a file is still being written.
+PARTIAL_SUFFIXES = ('.part', '.partial', '.crdownload', '.download', '.tmp', '.!qb')
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, watcher: 'DirectoryWatcher'):
+        super().__init__()
+        self._watcher = watcher
+
+    def on_created(self, event) -> None:
+        self._watcher.notify(event.src_path, event.is_directory)
+
+    def on_modified(self, event) -> None:
+        if not event.is_directory:
+            self._watcher.notify(event.src_path)
+
+    def on_closed(self, event) -> None:
+        self._watcher.notify(event.src_path)
+
+    def on_moved(self, event) -> None:
+        self._watcher.notify(event.dest_path, event.is_directory)
+
+
+class DirectoryWatcher:
+    # Events only mark a path as pending. Every tick the pending paths are
+    # stat'ed and a file is organized once its size and mtime have stayed
+    # unchanged for `settle` seconds, so half-written files are left alone and
+    # a burst of events for the same file costs a single move.
+    def __init__(self, directory: str, organizer: FileOrganizer, settle: float = 2.0, interval: float = 0.5,
+                 use_watchdog: bool = True, on_moved: Optional[Callable[[List[Tuple[str, str]]], None]] = None,
+                 journal: Optional[MoveJournal] = None, on_error: Optional[Callable[[OSError], None]] = None):
+        self.directory = os.path.abspath(directory)
+        self.organizer = organizer
+        self.settle = settle
+        self.interval = interval
+        self.use_watchdog = use_watchdog and Observer is not None
+        self.on_moved = on_moved
+        self.journal = journal
+        self.on_error = on_error
+        self._lock = threading.Lock()
+        self._events: Set[str] = set()
+        self._pending: Dict[str, Tuple[Optional[Tuple[int, float]], float]] = {}
+        self._snapshot: Dict[str, Tuple[int, float]] = {}
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def is_ignored(self, path: str) -> bool:
+        relative_path = os.path.relpath(path, self.directory)
+        top_level = relative_path.split(os.sep, 1)[0]
+        if top_level == os.pardir or top_level in self.organizer.category_folders():
+            return True
+        if self.organizer.is_state_path(path):
+            return True
+        return path.endswith(PARTIAL_SUFFIXES)
+
+    def notify(self, path: str, is_directory: bool = False) -> None:
+        if self.is_ignored(path):
+            return
+        if is_directory:
+            # A directory moved in produces no events for the files inside it.
+            paths = [record.path for record in self.organizer.scan(path)]
+        else:
+            paths = [path]
+        with self._lock:
+            self._events.update(paths)
+
+    def _poll(self) -> None:
+        snapshot = {
+            record.path: (record.size, record.mtime)
+            for record in self.organizer.scan(self.directory, with_stat=True, prune=self.is_ignored)
+        }
+        changed = [path for path, signature in snapshot.items() if self._snapshot.get(path) != signature]
+        self._snapshot = snapshot
+        with self._lock:
+            self._events.update(path for path in changed if not path.endswith(PARTIAL_SUFFIXES))
+
+    def _collect_ready(self, now: float) -> List[str]:
+        with self._lock:
+            events, self._events = self._events, set()
+        for path in events:
+            self._pending.setdefault(path, (None, now))
+
+        ready = []
+        for path, (signature, changed_at) in list(self._pending.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self._pending[path]
+                continue
+            current = (stat.st_size, stat.st_mtime)
+            if current != signature:
+                self._pending[path] = (current, now)
+            elif now - changed_at >= self.settle:
+                del self._pending[path]
+                ready.append(path)
+        return ready
+
+    def _organize(self, paths: List[str]) -> None:
+        moved = execute_plan(self.organizer.plan_files(self.directory, paths), journal=self.journal,
+                             verify=self.organizer.verify_copies)
+        if moved and self.on_moved is not None:
+            self.on_moved(moved)
+
+    def run(self, organize_existing: bool = True) -> None:
+        if organize_existing:
+            self._organize_all()
+        observer = None
+        if self.use_watchdog:
+            observer = Observer()
+            observer.schedule(_EventHandler(self), self.directory, recursive=True)
+            observer.start()
+        else:
+            self._snapshot = {
+                record.path: (record.size, record.mtime)
+                for record in self.organizer.scan(self.directory, with_stat=True, prune=self.is_ignored)
+            }
+        try:
+            while not self._stop.wait(self.interval):
+                if observer is None:
+                    self._poll()
+                ready = self._collect_ready(time.monotonic())
+                if not ready:
+                    continue
+                try:
+                    self._organize(ready)
+                except OSError as e:
+                    # One bad batch must not end the watch; its files are
+                    # picked up again by their next change.
+                    if self.on_error is not None:
+                        self.on_error(e)
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
+    def _organize_all(self) -> None:
+        moved = execute_plan(self.organizer.plan_organization(self.directory), journal=self.journal,
+                             verify=self.organizer.verify_copies)
+        if moved and self.on_moved is not None:
+            self.on_moved(moved)
+